@@ -1,18 +1,44 @@
 import json
 import logging
+import threading
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from agent.graph.base_graph import build_graph
-from agent.memory.memory import format_memory_for_prompt, save_turn
+from agent.memory.memory import aformat_memory_for_prompt, asave_turn
+from agent.memory.session_store import json_size, store_from_env
 from agent.types import ReasoningState
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-agent = build_graph()
 
-# In-memory state store keyed by session_id
-_state_store: dict[str, dict] = {}
+_agent = None
+_agent_lock = threading.Lock()
+
+def get_agent():
+    """Compiles the reasoning graph on first use (or during startup warmup)."""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = build_graph()
+    return _agent
+
+def _trim_state(state: dict, max_bytes: int) -> dict:
+    """Drops bulky, re-derivable fields until a stored state fits its per-session cap."""
+    for key in ("ado_context", "context", "web_result", "reasoning_steps"):
+        if json_size(state) <= max_bytes:
+            break
+        state[key] = [] if key in ("context", "reasoning_steps") else None
+    return state
+
+def _stored_state(result: ReasoningState) -> dict:
+    # `history` is rebuilt from session memory on every request, so it is not persisted twice
+    return result.dict(exclude={"history"})
+
+# Bounded (TTL + LRU + byte budget) state store keyed by session_id; SESSION_BACKEND=sqlite
+# shares it between workers so follow-ups ("log it") find the draft on any worker
+_state_store = store_from_env("state", sizeof=json_size, shrink=_trim_state)
 
 class AgentRequest(BaseModel):
     input: str = Field(..., description="User's latest message")
@@ -28,12 +54,12 @@ class AgentResponse(BaseModel):
 @router.post("/reasoned", response_model=AgentResponse)
 async def run_agent_reasoning(request: AgentRequest) -> dict:
     sid = request.session_id
-    stored = _state_store.get(sid)
+    stored = await _state_store.aget(sid)
 
     if stored:
         state = ReasoningState(**stored)
         state.user_input = request.input
-        state.history = format_memory_for_prompt(sid)
+        state.history = await aformat_memory_for_prompt(sid)
         logger.debug(f"Loaded stored state for session {sid}")
     else:
         state = ReasoningState(
@@ -43,7 +69,7 @@ async def run_agent_reasoning(request: AgentRequest) -> dict:
             node="",
             context=[],
             response="",
-            history=format_memory_for_prompt(sid),
+            history=await aformat_memory_for_prompt(sid),
             ado_context=None,
             web_result=None,
             bug_template=None,
@@ -52,7 +78,9 @@ async def run_agent_reasoning(request: AgentRequest) -> dict:
         logger.debug(f"Created new state for session {sid}")
 
     try:
-        result = await agent.invoke(state) if callable(getattr(agent.invoke, "__await__", None)) else agent.invoke(state)
+        # Async graph execution: nodes await their LLM/ADO/web calls and run embedding
+        # on an executor, so a slow call never blocks other sessions on this worker
+        result = await get_agent().ainvoke(state)
         if not isinstance(result, ReasoningState):
             result = ReasoningState(**result)
         logger.debug(f"Agent invocation successful for session {sid}")
@@ -63,8 +91,8 @@ async def run_agent_reasoning(request: AgentRequest) -> dict:
             detail=f"Internal agent pipeline error: {e}"
         )
 
-    _state_store[sid] = result.dict()
-    save_turn(request.input, result.response, sid)
+    await _state_store.aset(sid, _stored_state(result))
+    await asave_turn(request.input, result.response, sid)
 
     return {
         "response": result.response,
@@ -77,12 +105,12 @@ async def run_agent_reasoning(request: AgentRequest) -> dict:
 @router.post("/reasoned/stream")
 async def run_agent_reasoning_stream(request: AgentRequest) -> StreamingResponse:
     sid = request.session_id
-    stored = _state_store.get(sid)
+    stored = await _state_store.aget(sid)
 
     if stored:
         state = ReasoningState(**stored)
         state.user_input = request.input
-        state.history = format_memory_for_prompt(sid)
+        state.history = await aformat_memory_for_prompt(sid)
         logger.debug(f"Loaded stored state for streaming session {sid}")
     else:
         state = ReasoningState(
@@ -92,7 +120,7 @@ async def run_agent_reasoning_stream(request: AgentRequest) -> StreamingResponse
             node="",
             context=[],
             response="",
-            history=format_memory_for_prompt(sid),
+            history=await aformat_memory_for_prompt(sid),
             ado_context=None,
             web_result=None,
             bug_template=None,
@@ -101,30 +129,29 @@ async def run_agent_reasoning_stream(request: AgentRequest) -> StreamingResponse
         logger.debug(f"Created new state for streaming session {sid}")
 
     async def event_generator():
+        # "custom" carries thoughts and token deltas emitted inside nodes (no state copies);
+        # "updates" carries each node's finished state, used for the final response.
+        result = None
         try:
-            stream_method = agent.stream
-            if callable(getattr(stream_method, "__aiter__", None)):
-                async for step_dict in stream_method(state):
+            async for mode, chunk in get_agent().astream(state, stream_mode=["custom", "updates"]):
+                if mode == "custom":
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    continue
+                for step_data in chunk.values():
                     try:
-                        step_data = next(iter(step_dict.values())) if len(step_dict) == 1 else step_dict
-                        step = ReasoningState(**step_data)
-                        if step.thought:
-                            yield f"data: {json.dumps({'type': 'thought', 'content': step.thought})}\n\n"
-                        if step.response:
-                            yield f"data: {json.dumps({'type': 'response', 'content': step.response})}\n\n"
+                        step = step_data if isinstance(step_data, ReasoningState) else ReasoningState(**step_data)
                     except Exception as e:
-                        logger.error(f"Error parsing step dict in async stream: {e}")
-            else:
-                for step_dict in stream_method(state):
-                    try:
-                        step_data = next(iter(step_dict.values())) if len(step_dict) == 1 else step_dict
-                        step = ReasoningState(**step_data)
-                        if step.thought:
-                            yield f"data: {json.dumps({'type': 'thought', 'content': step.thought})}\n\n"
-                        if step.response:
-                            yield f"data: {json.dumps({'type': 'response', 'content': step.response})}\n\n"
-                    except Exception as e:
-                        logger.error(f"Error parsing step dict in sync stream: {e}")
+                        logger.error(f"Error parsing step update in stream: {e}")
+                        continue
+                    result = step
+                    if step.thought:
+                        yield f"data: {json.dumps({'type': 'thought', 'content': step.thought})}\n\n"
+
+            if result is not None:
+                # Final, post-processed answer; clients should replace the streamed deltas with it
+                yield f"data: {json.dumps({'type': 'response', 'content': result.response})}\n\n"
+                await _state_store.aset(sid, _stored_state(result))
+                await asave_turn(request.input, result.response, sid)
 
             yield "data: [DONE]\n\n"
             logger.debug(f"Streaming completed for session {sid}")
@@ -133,3 +160,7 @@ async def run_agent_reasoning_stream(request: AgentRequest) -> StreamingResponse
             yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+def state_stats() -> dict:
+    """Session count, accounted bytes and eviction counters of the state store."""
+    return _state_store.stats()
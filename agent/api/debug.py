@@ -1,7 +1,11 @@
 # agent/api/chat_debug.py
 
 from fastapi import APIRouter
-from agent.memory.memory import load_conversation_history
+from agent.memory.memory import load_conversation_history, memory_stats
+from agent.api.agent_reasoned import state_stats
+from agent.utils.intent_cache import get_intent_cache
+from agent.utils.intent_prototypes import get_intent_classifier
+from agent.utils.llm_response import get_llm_cache
 from langchain_core.messages import HumanMessage
 
 router = APIRouter()
@@ -24,3 +28,30 @@ def debug_chat():
         "history": trace,
         "turns": len(trace)
     }
+
+@router.get("/debug/sessions")
+def debug_sessions():
+    """
+    Returns size and eviction counters of the session stores (memory and agent state).
+    """
+    return {
+        "memory": memory_stats(),
+        "state": state_stats(),
+    }
+
+@router.get("/debug/intent")
+def debug_intent():
+    """
+    Returns how intents were decided without the LLM: prototype fast path and intent cache hit rates.
+    """
+    return {
+        "prototypes": get_intent_classifier().stats(),
+        "cache": get_intent_cache().stats(),
+    }
+
+@router.get("/debug/llm-cache")
+def debug_llm_cache():
+    """
+    Returns entry count and hit rate of the LLM response cache.
+    """
+    return get_llm_cache().stats()
@@ -0,0 +1,22 @@
+# agent/api/health.py
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from agent.utils.warmup import is_ready, status
+
+router = APIRouter()
+
+@router.get("/health")
+async def health():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once models and clients are loaded, 503 while warming up.
+    """
+    body = status()
+    return JSONResponse(status_code=200 if is_ready() else 503, content=body)
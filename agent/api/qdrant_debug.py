@@ -1,15 +1,23 @@
 # agent/api/qdrant_debug.py
 
 from fastapi import APIRouter
-from agent.vector.qdrant_client import client, search_similar
+from agent.vector.qdrant_client import VECTOR_READ_BACKEND, get_client, search_similar, get_embedding_cache
+from agent.vector.snapshot import get_snapshot
 import os
+from typing import Optional
 
 router = APIRouter()
 
 @router.get("/test/qdrant")
 async def test_qdrant():
+    # Snapshot readers must not open the embedded store: the indexer holds its lock
+    if VECTOR_READ_BACKEND == "snapshot":
+        snapshot = get_snapshot()
+        if snapshot is None:
+            return {"status": "error", "details": "No vector snapshot published yet"}
+        return {"status": "ok", "backend": "snapshot", "snapshot": os.path.basename(snapshot.path), "count": snapshot.count}
     try:
-        collections = client.get_collections()
+        collections = get_client().get_collections()
         return {
             "status": "ok",
             "collections": [c.name for c in collections.collections]
@@ -19,8 +27,14 @@ async def test_qdrant():
 
 @router.get("/test/qdrant/sample")
 async def sample_qdrant_docs(limit: int = 5):
+    if VECTOR_READ_BACKEND == "snapshot":
+        snapshot = get_snapshot()
+        if snapshot is None:
+            return {"status": "error", "details": "No vector snapshot published yet"}
+        docs = [{"id": p.get("id"), "payload": p} for p in snapshot.payloads[:limit]]
+        return {"status": "ok", "count": len(docs), "samples": docs}
     try:
-        points = client.scroll(
+        points = get_client().scroll(
             collection_name=os.getenv("QDRANT_COLLECTION", "agent-knowledge"),
             limit=limit
         )
@@ -39,9 +53,18 @@ async def sample_qdrant_docs(limit: int = 5):
         return {"status": "error", "details": str(e)}
 
 @router.get("/test/qdrant/search")
-async def test_semantic_search(query: str, top_k: int = 3):
+async def test_semantic_search(
+    query: str,
+    top_k: int = 3,
+    score_threshold: Optional[float] = None,
+    source: Optional[str] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+):
     try:
-        hits = search_similar(query, top_k=top_k)
+        hits = search_similar(
+            query, top_k=top_k, score_threshold=score_threshold, source=source, type=type, status=status
+        )
         return {
             "status": "ok",
             "query": query,
@@ -49,3 +72,7 @@ async def test_semantic_search(query: str, top_k: int = 3):
         }
     except Exception as e:
         return {"status": "error", "details": str(e)}
+
+@router.get("/test/qdrant/embedding-cache")
+async def embedding_cache_stats():
+    return {"status": "ok", "stats": get_embedding_cache().stats()}
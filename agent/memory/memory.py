@@ -1,46 +1,168 @@
+import os
+import logging
 from langchain.memory import ConversationBufferMemory
 from langchain_core.messages import HumanMessage, AIMessage
-from typing import List, Union
+from typing import List, Optional, Union
+from agent.memory.session_store import store_from_env
 
-_memory_store: dict[str, ConversationBufferMemory] = {}
+logger = logging.getLogger(__name__)
+
+# Sessions are stored as one compact record per session so any SessionStore backend can
+# serialize it and share it across workers:
+#   turns:   full history as [role, content] pairs ("u" = user, "a" = agent), trimmed by the store
+#   window:  formatted "User:/Agent:" lines of the most recent turns, within HISTORY_MAX_TOKENS
+#   tokens:  estimated token count of `window`
+#   text:    cached "\n".join(window), served to prompts as-is
+#   summary: rolling summary of turns that slid out of the window (HISTORY_SUMMARY=true)
+#   pending: lines that slid out but are not summarized yet
+USER, AGENT = "u", "a"
+
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", 1000))
+HISTORY_SUMMARY = os.getenv("HISTORY_SUMMARY", "false").lower() == "true"
+HISTORY_SUMMARY_BATCH = int(os.getenv("HISTORY_SUMMARY_BATCH", 6))
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and a product assistant. "
+    "Keep product names, bug/story titles, IDs and decisions; drop small talk. "
+    "Reply with the new summary only, at most 5 sentences.\n\n"
+    "Current summary:\n{summary}\n\nNew lines:\n{lines}"
+)
+
+def _new_record() -> dict:
+    return {"turns": [], "window": [], "tokens": 0, "text": "", "summary": "", "pending": []}
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token); no tokenizer call on the request path."""
+    return len(text) // 4 + 1
+
+def _memory_size(record: dict) -> int:
+    turns = sum(len(content.encode("utf-8")) + 8 for _, content in record["turns"])
+    return turns + 2 * len(record["text"].encode("utf-8")) + len(record["summary"]) + sum(len(l) for l in record["pending"])
+
+def _trim_memory(record: dict, max_bytes: int) -> dict:
+    """Drops the oldest stored turns until the record fits the per-session cap (the prompt window is kept)."""
+    record = dict(record, turns=list(record["turns"]))
+    while record["turns"] and _memory_size(record) > max_bytes:
+        record["turns"].pop(0)
+    return record
+
+# Bounded (TTL + LRU + byte budget) store of per-session history records
+_memory_store = store_from_env("memory", sizeof=_memory_size, shrink=_trim_memory)
+
+def _to_message(role: str, content: str) -> Union[HumanMessage, AIMessage]:
+    return HumanMessage(content=content) if role == USER else AIMessage(content=content)
+
+def _append_line(record: dict, line: str):
+    """Adds a line to the window and slides the oldest lines out until it fits the token budget."""
+    record["window"].append(line)
+    record["tokens"] += estimate_tokens(line)
+    record["text"] = f"{record['text']}\n{line}" if record["text"] else line
+    while len(record["window"]) > 1 and record["tokens"] > HISTORY_MAX_TOKENS:
+        oldest = record["window"].pop(0)
+        record["tokens"] -= estimate_tokens(oldest)
+        record["text"] = record["text"][len(oldest) + 1:]
+        if HISTORY_SUMMARY:
+            record["pending"].append(oldest)
+
+def _summary_prompt(record: dict) -> Optional[str]:
+    """Prompt that folds pending lines into the rolling summary, once a batch has accumulated."""
+    if not HISTORY_SUMMARY or len(record["pending"]) < HISTORY_SUMMARY_BATCH:
+        return None
+    return SUMMARY_PROMPT.format(summary=record["summary"] or "(none)", lines="\n".join(record["pending"]))
+
+def _apply_summary(record: dict, summary: Optional[str]):
+    if summary is not None:
+        record["summary"] = summary
+        record["pending"] = []
+    else:
+        # Keep the backlog bounded if the LLM stays unavailable
+        record["pending"] = record["pending"][-4 * HISTORY_SUMMARY_BATCH:]
 
 def get_memory(session_id: str = "default") -> ConversationBufferMemory:
-    """Returns (or creates) a session-specific memory buffer."""
-    if session_id not in _memory_store:
-        _memory_store[session_id] = ConversationBufferMemory(
-            memory_key="history",
-            return_messages=True,
-            input_key="input",
-        )
-    return _memory_store[session_id]
+    """Returns a memory buffer populated with the session's history (a snapshot; use save_turn to add to it)."""
+    memory = ConversationBufferMemory(
+        memory_key="history",
+        return_messages=True,
+        input_key="input",
+    )
+    memory.chat_memory.messages = load_conversation_history(session_id)
+    return memory
 
 def load_conversation_history(session_id: str = "default") -> List[Union[HumanMessage, AIMessage]]:
     """Returns raw message history for a session as LangChain message objects."""
-    return get_memory(session_id).chat_memory.messages
+    record = _memory_store.get(session_id) or _new_record()
+    return [_to_message(role, content) for role, content in record["turns"]]
+
+def _with_turn(stored: Optional[dict], user: str, ai: str) -> dict:
+    """Copy of a session's stored record with a user→agent turn appended and the window updated."""
+    record = dict(stored or _new_record())
+    record["turns"] = list(record["turns"])
+    record["window"] = list(record["window"])
+    record["pending"] = list(record["pending"])
+    for role, content in ((USER, user), (AGENT, ai)):
+        if not content:
+            continue
+        record["turns"].append([role, content])
+        content = content.strip()
+        if content:
+            _append_line(record, f"{'User' if role == USER else 'Agent'}: {content}")
+    return record
 
 def save_turn(user: str, ai: str, session_id: str = "default"):
-    """Appends a user→agent turn to the session's memory buffer."""
-    memory = get_memory(session_id)
-    if user:
-        memory.chat_memory.add_user_message(user)
-    if ai:
-        memory.chat_memory.add_ai_message(ai)
+    """
+    Appends a user→agent turn to the session's history and updates its prompt window.
+    May call the LLM to summarize (HISTORY_SUMMARY); async code should use asave_turn.
+    """
+    record = _with_turn(_memory_store.get(session_id), user, ai)
+    prompt = _summary_prompt(record)
+    if prompt:
+        from agent.utils.llm_response import call_llm
+        try:
+            summary = call_llm(prompt)
+        except Exception as e:
+            logger.error(f"History summarization failed: {e}")
+            summary = None
+        _apply_summary(record, summary)
+    # One write per turn; the store re-accounts the size (and trims if over the cap)
+    _memory_store.set(session_id, record)
+
+async def asave_turn(user: str, ai: str, session_id: str = "default"):
+    """Async variant of save_turn: neither the store nor the summary LLM call blocks the event loop."""
+    record = _with_turn(await _memory_store.aget(session_id), user, ai)
+    prompt = _summary_prompt(record)
+    if prompt:
+        from agent.utils.llm_response import acall_llm
+        try:
+            summary = await acall_llm(prompt)
+        except Exception as e:
+            logger.error(f"History summarization failed: {e}")
+            summary = None
+        _apply_summary(record, summary)
+    await _memory_store.aset(session_id, record)
 
 def reset_memory(session_id: str = "default"):
     """Clears the entire memory buffer for a session."""
-    get_memory(session_id).clear()
+    _memory_store.delete(session_id)
+
+def memory_stats() -> dict:
+    """Session count, accounted bytes and eviction counters of the memory store."""
+    return _memory_store.stats()
 
 def format_memory_for_prompt(session_id: str = "default") -> str:
     """
-    Formats a session's memory history into a plain-text string for LLM injection.
-    Each turn is prepended with 'User:' or 'Agent:'.
+    Returns the session's history for LLM injection: the rolling summary (if any) followed
+    by the most recent turns within HISTORY_MAX_TOKENS, each prepended with 'User:' or 'Agent:'.
+    The text is maintained by save_turn, so this is a single lookup regardless of session length.
     """
-    memory = get_memory(session_id)
-    lines = []
-    for msg in memory.chat_memory.messages:
-        role = "User" if isinstance(msg, HumanMessage) else "Agent"
-        content = msg.content.strip()
-        if content:
-            lines.append(f"{role}: {content}")
-    return "\n".join(lines).strip()
- 
\ No newline at end of file
+    return _prompt_text(_memory_store.get(session_id))
+
+async def aformat_memory_for_prompt(session_id: str = "default") -> str:
+    """Async variant of format_memory_for_prompt, for request handlers."""
+    return _prompt_text(await _memory_store.aget(session_id))
+
+def _prompt_text(record: Optional[dict]) -> str:
+    if not record:
+        return ""
+    if record["summary"]:
+        return f"Summary of earlier conversation: {record['summary']}\n{record['text']}".strip()
+    return record["text"]
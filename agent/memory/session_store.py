@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import zlib
+import logging
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def json_size(value: Any) -> int:
+    """Approximate footprint of a JSON-like value: its UTF-8 encoded JSON length."""
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+class SessionStore(ABC):
+    """
+    Per-session key/value store used for conversation memory and agent state.
+    Values must be JSON-serializable so durable backends can share them across workers.
+
+    Every backend enforces the same limits:
+    - Entries idle for longer than `ttl_seconds` expire.
+    - When there are more than `max_sessions` entries, or their accounted size exceeds
+      `max_total_bytes`, the least recently used sessions are evicted.
+    - An entry larger than `max_session_bytes` is passed to `shrink(value, max_bytes)`
+      (e.g. drop the oldest turns) before it is stored.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_sessions: int = 1000,
+        ttl_seconds: float = 3600,
+        max_total_bytes: int = 64 * 1024 * 1024,
+        max_session_bytes: int = 256 * 1024,
+        sizeof: Callable[[Any], int] = json_size,
+        shrink: Optional[Callable[[Any, int], Any]] = None,
+    ):
+        self.name = name
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self.max_session_bytes = max_session_bytes
+        self.sizeof = sizeof
+        self.shrink = shrink
+        self.evictions = 0
+        self.expirations = 0
+
+    def _fit(self, value: Any) -> Tuple[Any, int]:
+        size = self.sizeof(value)
+        if size > self.max_session_bytes and self.shrink is not None:
+            value = self.shrink(value, self.max_session_bytes)
+            size = self.sizeof(value)
+        return value, size
+
+    @abstractmethod
+    def get(self, session_id: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, session_id: str, value: Any):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+    async def aget(self, session_id: str, default: Any = None) -> Any:
+        """Async get for request handlers; backends that do I/O run it off the event loop."""
+        return self.get(session_id, default)
+
+    async def aset(self, session_id: str, value: Any):
+        self.set(session_id, value)
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Any]:
+        """Returns {session_id: value} for the sessions that exist."""
+        found = {}
+        for session_id in session_ids:
+            value = self.get(session_id)
+            if value is not None:
+                found[session_id] = value
+        return found
+
+    def set_many(self, items: Dict[str, Any]):
+        for session_id, value in items.items():
+            self.set(session_id, value)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local backend: an OrderedDict in access order. Fastest, but not shared
+    between workers and lost on restart.
+    """
+
+    def __init__(self, name: str, **kwargs):
+        super().__init__(name, **kwargs)
+        # session_id -> (value, size, last_access)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    def _drop(self, session_id: str):
+        _, size, _ = self._entries.pop(session_id)
+        self._total_bytes -= size
+
+    def _expire(self, now: float):
+        # Entries are kept in access order, so expired ones are at the front
+        while self._entries:
+            session_id, (_, _, last_access) = next(iter(self._entries.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            self._drop(session_id)
+            self.expirations += 1
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return default
+            value, size, _ = entry
+            self._entries[session_id] = (value, size, now)
+            self._entries.move_to_end(session_id)
+            return value
+
+    def set(self, session_id: str, value: Any):
+        value, size = self._fit(value)
+        now = time.monotonic()
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id)
+            self._entries[session_id] = (value, size, now)
+            self._total_bytes += size
+            self._expire(now)
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_sessions or self._total_bytes > self.max_total_bytes
+            ):
+                evicted = next(iter(self._entries))
+                self._drop(evicted)
+                self.evictions += 1
+                logger.debug(f"[SessionStore:{self.name}] Evicted session {evicted}")
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "name": self.name,
+                "backend": "memory",
+                "sessions": len(self._entries),
+                "max_sessions": self.max_sessions,
+                "total_bytes": self._total_bytes,
+                "max_total_bytes": self.max_total_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Durable backend shared by all workers on a host: one SQLite file in WAL mode
+    (concurrent readers, one writer), one row per session and store name. Values are
+    stored as compact JSON, zlib-compressed when large. Survives restarts, so in-flight
+    bug/story drafts are not lost.
+
+    Last-access times are only rewritten on reads when older than `touch_interval`
+    seconds, and TTL/LRU/size limits are enforced by a sweep every `sweep_every` writes.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            store TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (store, session_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (store, accessed_at);
+    """
+
+    def __init__(self, name: str, path: str = "./sessions.db", sweep_every: int = 100, touch_interval: float = 60, **kwargs):
+        super().__init__(name, **kwargs)
+        self.path = path
+        self.sweep_every = sweep_every
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._conn().executescript(self._SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        raw = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+        if len(raw) > 1024:
+            return b"z" + zlib.compress(raw, 1)
+        return b"j" + raw
+
+    @staticmethod
+    def _decode(blob: bytes) -> Any:
+        blob = bytes(blob)
+        raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+        return json.loads(raw)
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        return self.get_many([session_id]).get(session_id, default)
+
+    async def aget(self, session_id: str, default: Any = None) -> Any:
+        # Reads may wait up to the busy timeout on another worker's write
+        return await asyncio.to_thread(self.get, session_id, default)
+
+    async def aset(self, session_id: str, value: Any):
+        await asyncio.to_thread(self.set, session_id, value)
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Any]:
+        session_ids = list(session_ids)
+        if not session_ids:
+            return {}
+        now = time.time()
+        conn = self._conn()
+        placeholders = ",".join("?" * len(session_ids))
+        rows = conn.execute(
+            f"SELECT session_id, value, accessed_at FROM sessions WHERE store = ? AND session_id IN ({placeholders})",
+            [self.name, *session_ids],
+        ).fetchall()
+        found, expired, stale = {}, [], []
+        for session_id, blob, accessed_at in rows:
+            if now - accessed_at > self.ttl_seconds:
+                expired.append(session_id)
+                continue
+            found[session_id] = self._decode(blob)
+            if now - accessed_at > self.touch_interval:
+                stale.append(session_id)
+        if expired:
+            conn.executemany("DELETE FROM sessions WHERE store = ? AND session_id = ?", [(self.name, s) for s in expired])
+            self.expirations += len(expired)
+        if stale:
+            conn.executemany(
+                "UPDATE sessions SET accessed_at = ? WHERE store = ? AND session_id = ?",
+                [(now, self.name, s) for s in stale],
+            )
+        return found
+
+    def set(self, session_id: str, value: Any):
+        self.set_many({session_id: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for session_id, value in items.items():
+            value, size = self._fit(value)
+            rows.append((self.name, session_id, self._encode(value), size, now))
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (store, session_id, value, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        with self._writes_lock:
+            self._writes += len(rows)
+            due = self._writes >= self.sweep_every
+            if due:
+                self._writes = 0
+        if due:
+            self.sweep()
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM sessions WHERE store = ? AND session_id = ?", (self.name, session_id))
+
+    def sweep(self):
+        """Deletes expired sessions, then the least recently used ones beyond the count/size budget."""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(
+                "DELETE FROM sessions WHERE store = ? AND accessed_at < ?",
+                (self.name, time.time() - self.ttl_seconds),
+            )
+            self.expirations += max(cur.rowcount, 0)
+            rows = conn.execute(
+                "SELECT session_id, size FROM sessions WHERE store = ? ORDER BY accessed_at DESC",
+                (self.name,),
+            ).fetchall()
+            total, evict = 0, []
+            for n, (session_id, size) in enumerate(rows):
+                total += size
+                if n >= self.max_sessions or (n > 0 and total > self.max_total_bytes):
+                    evict.append((self.name, session_id))
+            if evict:
+                conn.executemany("DELETE FROM sessions WHERE store = ? AND session_id = ?", evict)
+                self.evictions += len(evict)
+
+    def stats(self) -> dict:
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions WHERE store = ?", (self.name,)
+        ).fetchone()
+        return {
+            "name": self.name,
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": count,
+            "max_sessions": self.max_sessions,
+            "total_bytes": total,
+            "max_total_bytes": self.max_total_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+def store_from_env(name: str, **kwargs) -> SessionStore:
+    """
+    Builds a SessionStore from SESSION_* environment variables.
+    SESSION_BACKEND selects "memory" (default, per process) or "sqlite" (shared, durable,
+    file at SESSION_DB_PATH).
+    """
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        store_cls = SQLiteSessionStore
+        kwargs.setdefault("path", os.getenv("SESSION_DB_PATH", "./sessions.db"))
+    elif backend == "memory":
+        store_cls = InMemorySessionStore
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend}' (expected 'memory' or 'sqlite')")
+    return store_cls(
+        name,
+        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", 1000)),
+        ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", 6 * 3600)),
+        max_total_bytes=int(float(os.getenv("SESSION_MAX_TOTAL_MB", 64)) * 1024 * 1024),
+        max_session_bytes=int(float(os.getenv("SESSION_MAX_SESSION_KB", 256)) * 1024),
+        **kwargs,
+    )
@@ -1,78 +1,95 @@
 import logging
 from langchain_core.runnables import RunnableLambda
-from agent.vector.ado_client import ADOClient
+from agent.vector.ado_client import get_ado_client
 from agent.types import ReasoningState
+from agent.utils.keywords import has_keywords
 
 logger = logging.getLogger(__name__)
 
-CONFIRM_KEYWORDS_BUG = [
-    "log it", "submit", "submit bug", "log bug", "create bug", "raise bug", "file bug",
-    "add as bug", "please file a bug", "new bug", "add this as a bug", "report this bug",
-    "confirm bug", "file this bug", "file as bug"
-]
+def _bug_fields(state: ReasoningState):
+    """Validates the state and maps the bug template to ADO fields. Returns None if not submitting."""
+    state.thought = "Starting bug submission node."
 
-def bug_submission_node():
-    def handle(state: ReasoningState) -> ReasoningState:
-        state.thought = "Starting bug submission node."
+    if state.intent != "bug_log" or not state.bug_template:
+        logger.warning(f"[BugSubmission] Invalid state: intent={state.intent}, bug_template={state.bug_template}")
+        state.thought = "Invalid state for bug submission: missing bug template or intent mismatch."
+        return None
 
-        if state.intent != "bug_log" or not state.bug_template:
-            logger.warning(f"[BugSubmission] Invalid state: intent={state.intent}, bug_template={state.bug_template}")
-            state.thought = "Invalid state for bug submission: missing bug template or intent mismatch."
-            return state
+    user_reply = state.user_input.strip().lower()
+    if not has_keywords(user_reply, "confirm_bug"):
+        logger.info("[BugSubmission] No submit confirmation found in user reply.")
+        state.thought = "Waiting for user confirmation to submit the bug."
+        state.response = (
+            "To submit this bug, please confirm by saying something like 'log it' or 'submit bug'."
+        )
+        return None
 
-        user_reply = state.user_input.strip().lower()
-        if not any(k in user_reply for k in CONFIRM_KEYWORDS_BUG):
-            logger.info("[BugSubmission] No submit confirmation found in user reply.")
-            state.thought = "Waiting for user confirmation to submit the bug."
-            state.response = (
-                "To submit this bug, please confirm by saying something like 'log it' or 'submit bug'."
-            )
-            return state
+    state.thought = "User confirmed bug submission. Preparing Azure DevOps payload."
+    state.node = "bug_submission_node"
+    tpl = state.bug_template or {}
 
-        state.thought = "User confirmed bug submission. Preparing Azure DevOps payload."
-        state.node = "bug_submission_node"
-        tpl = state.bug_template or {}
+    # Normalize/defaults
+    priority = tpl.get("priority", "2")
+    try:
+        priority_int = int(priority)
+    except Exception:
+        priority_int = 2
 
-        # Normalize/defaults
-        priority = tpl.get("priority", "2")
-        try:
-            priority_int = int(priority)
-        except Exception:
-            priority_int = 2
+    severity = tpl.get("severity", "3 - Medium")
+    if not severity or severity == "N/A":
+        severity = "3 - Medium"
+
+    return {
+        "System.Title": tpl.get("title", ""),
+        "System.Description": tpl.get("description", ""),
+        "Microsoft.VSTS.TCM.ReproSteps": tpl.get("repro_steps", "No steps provided"),
+        "Microsoft.VSTS.Common.Priority": priority_int,
+        "Microsoft.VSTS.Common.Severity": severity,
+    }
 
-        severity = tpl.get("severity", "3 - Medium")
-        if not severity or severity == "N/A":
-            severity = "3 - Medium"
+def _bug_submitted(state: ReasoningState, result: dict) -> ReasoningState:
+    state.thought = "Bug successfully logged in Azure DevOps."
+    state.response = (
+        f"Bug successfully logged in Azure DevOps!\n"
+        f"• ID: {result.get('id')}\n"
+        f"• Title: {result.get('title')}\n"
+        f"• Link: {result.get('url') or 'N/A'}"
+    )
+    state.bug_template = None
+    logger.info(f"[BugSubmission] ADO create success: {result}")
+    return state
 
-        fields = {
-            "System.Title": tpl.get("title", ""),
-            "System.Description": tpl.get("description", ""),
-            "Microsoft.VSTS.TCM.ReproSteps": tpl.get("repro_steps", "No steps provided"),
-            "Microsoft.VSTS.Common.Priority": priority_int,
-            "Microsoft.VSTS.Common.Severity": severity,
-        }
+def _bug_submit_failed(state: ReasoningState, e: Exception) -> ReasoningState:
+    state.thought = "Failed to submit bug to Azure DevOps."
+    state.response = (
+        "Failed to submit the bug to ADO. Please try again later or contact support.\n"
+        f"Error: {e}\n"
+        f"Bug details: {state.bug_template or {}}"
+    )
+    logger.error(f"[BugSubmission] ADO create failed: {e}")
+    return state
 
+def bug_submission_node():
+    def handle(state: ReasoningState) -> ReasoningState:
+        fields = _bug_fields(state)
+        if fields is None:
+            return state
         try:
-            client = ADOClient()
+            client = get_ado_client()
             result = client.create_work_item("Bug", fields)
-            state.thought = "Bug successfully logged in Azure DevOps."
-            state.response = (
-                f"Bug successfully logged in Azure DevOps!\n"
-                f"• ID: {result.get('id')}\n"
-                f"• Title: {result.get('title')}\n"
-                f"• Link: {result.get('url') or 'N/A'}"
-            )
-            state.bug_template = None
-            logger.info(f"[BugSubmission] ADO create success: {result}")
         except Exception as e:
-            state.thought = "Failed to submit bug to Azure DevOps."
-            state.response = (
-                "Failed to submit the bug to ADO. Please try again later or contact support.\n"
-                f"Error: {e}\n"
-                f"Bug details: {tpl}"
-            )
-            logger.error(f"[BugSubmission] ADO create failed: {e}")
+            return _bug_submit_failed(state, e)
+        return _bug_submitted(state, result)
 
-        return state
+    async def ahandle(state: ReasoningState) -> ReasoningState:
+        fields = _bug_fields(state)
+        if fields is None:
+            return state
+        try:
+            client = get_ado_client()
+            result = await client.acreate_work_item("Bug", fields)
+        except Exception as e:
+            return _bug_submit_failed(state, e)
+        return _bug_submitted(state, result)
 
-    return RunnableLambda(handle)
+    return RunnableLambda(handle, afunc=ahandle)
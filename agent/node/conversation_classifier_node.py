@@ -2,29 +2,15 @@ import logging
 from langchain_core.messages import HumanMessage
 from langchain_core.runnables import RunnableLambda
 from agent.types import ReasoningState
-from agent.memory.memory import format_memory_for_prompt
-from agent.utils.llm_response import call_llm
+from agent.utils.llm_response import call_llm, acall_llm
+from agent.utils.intent_prototypes import INTENT_PROTO_ENABLED, get_intent_classifier
+from agent.utils.intent_cache import get_intent_cache
+from agent.utils.keywords import has_keywords, keywords_at_edges
+from agent.vector.qdrant_client import embed, aembed
 
 logger = logging.getLogger(__name__)
 
-CONFIRM_KEYWORDS_STORY = [
-    "log it", "submit", "submit story", "log story", "create story",
-    "raise story", "file story", "raise ticket", "log ticket", "add as story",
-    "make a story", "please file a story", "new story"
-]
-CONFIRM_KEYWORDS_BUG = [
-    "log it", "log this bug", "submit", "submit bug", "raise bug", "confirm bug", "file bug", "add as bug",
-    "please file a bug", "new bug", "add this as a bug", "report this bug"
-]
-GREETING_KEYWORDS = [
-    "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
-    "thanks", "thank you", "bye", "goodbye", "see you", "take care", "welcome"
-]
-# Add product context keywords for fallback bias
-PRODUCT_KEYWORDS = [
-    "entity", "page", "visible", "dashboard", "login", "bug", "story", "feature", "button", "screen", "form",
-    "profile", "app", "application", "submit", "status", "error", "issue", "report", "not working", "unable"
-]
+INTENT_LABELS = ["product_question", "bug_log", "story_log", "general_chat", "greeting", "clarify"]
 
 INTENT_CLASSIFIER_PROMPT = """
 You are an elite AI intent classifier for an AI-powered workflow/chat agent. Given the conversation and latest user message, assign the **single best intent** from the following options:
@@ -61,94 +47,171 @@ You are an elite AI intent classifier for an AI-powered workflow/chat agent. Giv
 Respond with ONE label only from: product_question, bug_log, story_log, general_chat, greeting, clarify.
 """
 
+def _classify_by_rules(state: ReasoningState) -> bool:
+    """Sticky template confirmations and greetings. Returns True if the intent was decided."""
+    user_input = state.user_input.strip().lower()
+    state.node = "conversation_classifier"
+    state.thought = f"Classifying user input: '{user_input}'..."
+
+    # Sticky confirmation if already in bug/story template flow
+    if getattr(state, "bug_template", None):
+        if has_keywords(user_input, "confirm_bug"):
+            state.thought = "Detected confirmation keywords for bug logging."
+            state.intent = "bug_log"
+            logger.info("Sticky bug_log intent [confirmation detected]")
+            return True
+    if getattr(state, "story_template", None):
+        if has_keywords(user_input, "confirm_story"):
+            state.thought = "Detected confirmation keywords for story logging."
+            state.intent = "story_log"
+            logger.info("Sticky story_log intent [confirmation detected]")
+            return True
+
+    # Robust greeting detection
+    if keywords_at_edges(user_input, "greeting"):
+        state.thought = "Detected greeting/farewell keyword."
+        state.intent = "greeting"
+        logger.info(f"Detected greeting/farewell intent: '{user_input}'")
+        return True
+    return False
+
+def _can_use_fast_path(state: ReasoningState) -> bool:
+    # Follow-ups inside a bug/story flow and very short replies ("yes", "log it") depend on
+    # the conversation, which the prototype stage does not see; leave those to the LLM
+    if getattr(state, "bug_template", None) or getattr(state, "story_template", None):
+        return False
+    return len(state.user_input.split()) >= 3
+
+def _apply_fast_label(state: ReasoningState, vector) -> bool:
+    """Embedding prototype stage. Returns True if it was confident enough to skip the LLM."""
+    if not INTENT_PROTO_ENABLED:
+        return False
+    try:
+        label, score = get_intent_classifier().decide(vector)
+    except Exception as e:
+        logger.error(f"Prototype classifier failed: {e}")
+        return False
+    if label is None:
+        logger.debug(f"Prototype classifier not confident (best score {score:.2f}), asking LLM")
+        return False
+    state.thought = f"Prototype classifier matched '{label}' (score {score:.2f})."
+    logger.info(f"Fast-path intent: {label} ({score:.2f}) | user_input: '{state.user_input}'")
+    _apply_label(state, label)
+    return True
+
+def _apply_cached_label(state: ReasoningState, vector) -> bool:
+    """Intent cache lookup (exact, then near-duplicate). Returns True on a hit."""
+    label = get_intent_cache().get(state.user_input, state.history, vector)
+    if label is None:
+        return False
+    state.thought = f"Intent cache hit: '{label}'."
+    _apply_label(state, label)
+    return True
+
+def _remember_label(state: ReasoningState, label: str, vector):
+    if label in INTENT_LABELS:
+        get_intent_cache().put(state.user_input, state.history, label, vector)
+
+def _classifier_llm_input(state: ReasoningState) -> list:
+    # History is formatted once per request by the endpoint (token-budgeted window)
+    history = state.history or ""
+    state.thought = "Invoking LLM for intent classification..."
+
+    prompt = INTENT_CLASSIFIER_PROMPT.format(
+        history=history,
+        user_input=state.user_input
+    )
+    logger.debug(f"Classifier prompt (len={len(prompt)}): {prompt[:200].replace(chr(10),' ')}...")
+    # FIX: Use HumanMessage for LangChain, not raw dict!
+    return [HumanMessage(content=prompt)]
+
+def _apply_label(state: ReasoningState, label: str) -> ReasoningState:
+    user_input = state.user_input.strip().lower()
+    if label not in INTENT_LABELS:
+        logger.warning(f"LLM gave unclear label '{label}', forcing bias fallback.")
+        state.thought = f"Unknown label '{label}', using bias fallback."
+        # Strong fallback bias for product keywords
+        if has_keywords(user_input, "product"):
+            label = "product_question"
+            state.thought = "Biasing to product_question based on product keywords."
+        elif has_keywords(user_input, "greeting"):
+            label = "greeting"
+            state.thought = "Biasing to greeting based on keywords."
+        else:
+            label = "clarify"
+            state.thought = "Could not determine intent, using clarify."
+
+    # --- Bulletproof fallback for clarify (product context should never clarify) ---
+    if label == "clarify":
+        if has_keywords(user_input, "product"):
+            state.intent = "product_question"
+            state.thought = "LLM returned clarify, but product keyword detected. Forcing product_question."
+            logger.warning("LLM returned clarify, but keyword biasing to product_question.")
+            return state
+        state.intent = "clarify"
+        state.response = (
+            "Can you clarify your request? Are you asking about your product, reporting a bug, logging a user story, or just chatting?"
+        )
+        logger.warning(f"Ambiguous intent: asking for clarification. user_input: '{user_input}'")
+        state.thought = "Intent is ambiguous, asking user for clarification."
+        return state
+
+    # Otherwise, return LLM-detected intent
+    state.intent = label
+    logger.info(f"Final classified intent: {state.intent} | user_input: '{state.user_input}' | node: '{state.node}'")
+    state.thought = f"Final classified intent: {state.intent}"
+    return state
+
 def conversation_classifier_node():
     def classify(state: ReasoningState) -> ReasoningState:
-        user_input = state.user_input.strip().lower()
-        state.node = "conversation_classifier"
-        state.thought = f"Classifying user input: '{user_input}'..."
-
-        # Sticky confirmation if already in bug/story template flow
-        if getattr(state, "bug_template", None):
-            if any(k in user_input for k in CONFIRM_KEYWORDS_BUG):
-                state.thought = "Detected confirmation keywords for bug logging."
-                state.intent = "bug_log"
-                logger.info("Sticky bug_log intent [confirmation detected]")
-                return state
-        if getattr(state, "story_template", None):
-            if any(k in user_input for k in CONFIRM_KEYWORDS_STORY):
-                state.thought = "Detected confirmation keywords for story logging."
-                state.intent = "story_log"
-                logger.info("Sticky story_log intent [confirmation detected]")
+        if _classify_by_rules(state):
+            return state
+        vector = None
+        if _can_use_fast_path(state):
+            try:
+                vector = embed(state.user_input.strip())
+            except Exception as e:
+                logger.error(f"Embedding for prototype classifier failed: {e}")
+            if vector is not None and _apply_fast_label(state, vector):
                 return state
-
-        # Robust greeting detection
-        if any(
-            (user_input == kw or user_input.startswith(kw + " ") or user_input.endswith(" " + kw))
-            for kw in GREETING_KEYWORDS
-        ) or user_input in GREETING_KEYWORDS:
-            state.thought = "Detected greeting/farewell keyword."
-            state.intent = "greeting"
-            logger.info(f"Detected greeting/farewell intent: '{user_input}'")
+        if _apply_cached_label(state, vector):
             return state
 
         # LLM-based classification
-        session_id = getattr(state, "session_id", "default")
-        history = format_memory_for_prompt(session_id)
-        state.thought = "Invoking LLM for intent classification..."
-
-        prompt = INTENT_CLASSIFIER_PROMPT.format(
-            history=history,
-            user_input=state.user_input
-        )
-        # FIX: Use HumanMessage for LangChain, not raw dict!
-        llm_input = [HumanMessage(content=prompt)]
-        logger.debug(f"Classifier prompt (len={len(prompt)}): {prompt[:200].replace(chr(10),' ')}...")
-
+        llm_input = _classifier_llm_input(state)
         try:
             label = call_llm(llm_input).strip().lower()
             state.thought = f"LLM classified input as '{label}'."
+            _remember_label(state, label, vector)
         except Exception as e:
             logger.error(f"Classifier LLM call failed: {e}")
             state.thought = "LLM call failed, falling back to clarify."
             label = "clarify"
+        return _apply_label(state, label)
 
-        allowed_labels = [
-            "product_question", "bug_log", "story_log", "general_chat", "greeting", "clarify"
-        ]
-
-        if label not in allowed_labels:
-            logger.warning(f"LLM gave unclear label '{label}', forcing bias fallback.")
-            state.thought = f"Unknown label '{label}', using bias fallback."
-            # Strong fallback bias for product keywords
-            if any(w in user_input for w in PRODUCT_KEYWORDS):
-                label = "product_question"
-                state.thought = "Biasing to product_question based on product keywords."
-            elif any(k in user_input for k in GREETING_KEYWORDS):
-                label = "greeting"
-                state.thought = "Biasing to greeting based on keywords."
-            else:
-                label = "clarify"
-                state.thought = "Could not determine intent, using clarify."
-
-        # --- Bulletproof fallback for clarify (product context should never clarify) ---
-        if label == "clarify":
-            if any(w in user_input for w in PRODUCT_KEYWORDS):
-                state.intent = "product_question"
-                state.thought = "LLM returned clarify, but product keyword detected. Forcing product_question."
-                logger.warning("LLM returned clarify, but keyword biasing to product_question.")
+    async def aclassify(state: ReasoningState) -> ReasoningState:
+        if _classify_by_rules(state):
+            return state
+        vector = None
+        if _can_use_fast_path(state):
+            try:
+                vector = await aembed(state.user_input.strip())
+            except Exception as e:
+                logger.error(f"Embedding for prototype classifier failed: {e}")
+            if vector is not None and _apply_fast_label(state, vector):
                 return state
-            state.intent = "clarify"
-            state.response = (
-                "Can you clarify your request? Are you asking about your product, reporting a bug, logging a user story, or just chatting?"
-            )
-            logger.warning(f"Ambiguous intent: asking for clarification. user_input: '{user_input}'")
-            state.thought = "Intent is ambiguous, asking user for clarification."
+        if _apply_cached_label(state, vector):
             return state
 
-        # Otherwise, return LLM-detected intent
-        state.intent = label
-        logger.info(f"Final classified intent: {state.intent} | user_input: '{state.user_input}' | node: '{state.node}'")
-        state.thought = f"Final classified intent: {state.intent}"
-        return state
+        llm_input = _classifier_llm_input(state)
+        try:
+            label = (await acall_llm(llm_input)).strip().lower()
+            state.thought = f"LLM classified input as '{label}'."
+            _remember_label(state, label, vector)
+        except Exception as e:
+            logger.error(f"Classifier LLM call failed: {e}")
+            state.thought = "LLM call failed, falling back to clarify."
+            label = "clarify"
+        return _apply_label(state, label)
 
-    return RunnableLambda(classify)
+    return RunnableLambda(classify, afunc=aclassify)
@@ -1,78 +1,116 @@
 import logging
 from langchain_core.runnables import RunnableLambda
 from langchain_core.messages import SystemMessage, HumanMessage
-from agent.utils.llm_response import call_llm
-from agent.memory.memory import save_turn
+from agent.utils.streaming import stream_llm_deltas, astream_llm_deltas
+from agent.memory.memory import save_turn, asave_turn
 from agent.types import ReasoningState
-from tavily import TavilyClient
+from agent.utils.keywords import has_keywords
+from tavily import TavilyClient, AsyncTavilyClient
 import os
 
 logger = logging.getLogger(__name__)
 
-PRODUCT_TRIGGER_WORDS = [
-    "login", "dashboard", "feature", "app", "button", "upload", "ui", "form", "page", "account",
-    "profile", "report", "error", "issue", "workflow", "search", "submit", "reset", "settings"
-]
+def _format_web_result(result: dict) -> str:
+    top = result["results"][0] if result.get("results") else None
+    if top:
+        snippet = top.get("answer") or top.get("content", "")
+        url = top.get("url", "")
+        return f"🔎 {snippet}\n(Source: {url})"
+    else:
+        return " I couldn’t find anything helpful online."
 
 def run_web_search(query: str) -> str:
     try:
         client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-        result = client.search(query=query, max_results=1)
-        top = result["results"][0] if result.get("results") else None
-        if top:
-            snippet = top.get("answer") or top.get("content", "")
-            url = top.get("url", "")
-            return f"🔎 {snippet}\n(Source: {url})"
-        else:
-            return " I couldn’t find anything helpful online."
+        return _format_web_result(client.search(query=query, max_results=1))
     except Exception as e:
         return f"Web search failed: {str(e)}"
 
-def general_chat_node():
-    def run(state: ReasoningState) -> ReasoningState:
-        query = state.user_input.strip()
-        history = state.history or ""
+async def arun_web_search(query: str) -> str:
+    try:
+        client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        return _format_web_result(await client.search(query=query, max_results=1))
+    except Exception as e:
+        return f"Web search failed: {str(e)}"
 
-        state.thought = "Preparing system prompt for general, non-product chat..."  # [Step 1]
+def _chat_messages(state: ReasoningState) -> list:
+    query = state.user_input.strip()
+    history = state.history or ""
 
-        system_prompt = (
-            "You are a helpful, friendly assistant for general, non-product questions. "
-            "Respond conversationally and humanly. If you don't know something, say: 'I don't know.'"
+    state.thought = "Preparing system prompt for general, non-product chat..."  # [Step 1]
+
+    system_prompt = (
+        "You are a helpful, friendly assistant for general, non-product questions. "
+        "Respond conversationally and humanly. If you don't know something, say: 'I don't know.'"
+    )
+
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=f"Chat so far:\n{history}\n\nUser now asked:\n{query}")
+    ]
+
+def _needs_web_search(answer: str) -> bool:
+    return not answer or "i don't know" in answer.lower() or "not sure" in answer.lower()
+
+def _finish_chat(state: ReasoningState, answer: str) -> ReasoningState:
+    query = state.user_input.strip()
+    if has_keywords(query, "product_trigger"):
+        state.thought = "Detected possible product keyword in general chat."
+        answer += (
+            "\n\n(If this is about your app, workflow, or a feature, please rephrase or try again for more tailored help!)"
         )
+    else:
+        state.thought = "General chat completed. Returning answer."
+    state.intent = "general_chat"
+    state.node = "general_chat"
+    state.response = answer
+    return state
+
+def _finish_web_search(state: ReasoningState, response: str) -> ReasoningState:
+    state.intent = "web_search"
+    state.node = "web_search"
+    state.response = response
+    return state
 
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"Chat so far:\n{history}\n\nUser now asked:\n{query}")
-        ]
+_LLM_FAILED_ANSWER = "Sorry, I'm having trouble thinking right now. Please try again!"
 
+def general_chat_node():
+    def run(state: ReasoningState) -> ReasoningState:
+        messages = _chat_messages(state)
         try:
             state.thought = "Calling LLM for a general chat response..."  # [Step 2]
-            answer = call_llm(messages).strip()
+            answer = stream_llm_deltas(messages)
             state.thought = f"LLM responded: {answer[:50]}..."  # partial response for debug
         except Exception as e:
             logger.error(f"LLM call failed in general_chat_node: {e}")
             state.thought = f"LLM call failed: {str(e)}"
-            answer = "Sorry, I'm having trouble thinking right now. Please try again!"
+            answer = _LLM_FAILED_ANSWER
+
+        if _needs_web_search(answer):
+            state.thought = "LLM was uncertain. Running web search fallback..."
+            state = _finish_web_search(state, run_web_search(state.user_input.strip()))
+        else:
+            state = _finish_chat(state, answer)
+        save_turn(state.user_input.strip(), state.response)
+        return state
+
+    async def arun(state: ReasoningState) -> ReasoningState:
+        messages = _chat_messages(state)
+        try:
+            state.thought = "Calling LLM for a general chat response..."
+            answer = await astream_llm_deltas(messages)
+            state.thought = f"LLM responded: {answer[:50]}..."
+        except Exception as e:
+            logger.error(f"LLM call failed in general_chat_node: {e}")
+            state.thought = f"LLM call failed: {str(e)}"
+            answer = _LLM_FAILED_ANSWER
 
-        if not answer or "i don't know" in answer.lower() or "not sure" in answer.lower():
+        if _needs_web_search(answer):
             state.thought = "LLM was uncertain. Running web search fallback..."
-            response = run_web_search(query)
-            state.intent = "web_search"
-            state.node = "web_search"
+            state = _finish_web_search(state, await arun_web_search(state.user_input.strip()))
         else:
-            if any(word in query.lower() for word in PRODUCT_TRIGGER_WORDS):
-                state.thought = "Detected possible product keyword in general chat."
-                answer += (
-                    "\n\n(If this is about your app, workflow, or a feature, please rephrase or try again for more tailored help!)"
-                )
-            else:
-                state.thought = "General chat completed. Returning answer."
-            response = answer
-            state.intent = "general_chat"
-            state.node = "general_chat"
-
-        save_turn(query, response)
-        state.response = response
+            state = _finish_chat(state, answer)
+        await asave_turn(state.user_input.strip(), state.response)
         return state
 
-    return RunnableLambda(run)
+    return RunnableLambda(run, afunc=arun)
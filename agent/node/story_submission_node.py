@@ -1,80 +1,98 @@
 import logging
 from langchain_core.runnables import RunnableLambda
-from agent.vector.ado_client import ADOClient
+from agent.vector.ado_client import get_ado_client
 from agent.types import ReasoningState
+from agent.utils.keywords import has_keywords
 
 logger = logging.getLogger(__name__)
 
-CONFIRM_KEYWORDS_STORY = [
-    "log it", "submit", "submit story", "log story", "create story",
-    "raise story", "file story", "raise ticket", "log ticket", "add as story",
-    "make a story", "please file a story", "new story"
-]
+def _story_fields(state: ReasoningState):
+    """Validates the state and maps the story template to ADO fields. Returns None if not submitting."""
+    logger.info(f"[StorySubmission] called with intent='{state.intent}' | user_input='{state.user_input}'")
+    state.thought = "Starting story submission process."
 
-def story_submission_node(): 
-    def handle(state: ReasoningState) -> ReasoningState:
-        logger.info(f"[StorySubmission] called with intent='{state.intent}' | user_input='{state.user_input}'")
-        state.thought = "Starting story submission process."
+    # Only allow for correct intent and present template
+    if state.intent != "story_log" or not state.story_template:
+        logger.warning(f"[StorySubmission] Invalid state: intent={state.intent}, story_template={state.story_template}")
+        state.thought = "Invalid state for story submission: either intent mismatch or missing template."
+        return None
 
-        # Only allow for correct intent and present template
-        if state.intent != "story_log" or not state.story_template:
-            logger.warning(f"[StorySubmission] Invalid state: intent={state.intent}, story_template={state.story_template}")
-            state.thought = "Invalid state for story submission: either intent mismatch or missing template."
-            return state
+    user_reply = state.user_input.strip().lower()
+    if not has_keywords(user_reply, "confirm_story"):
+        logger.info("[StorySubmission] No submit confirmation found in user reply.")
+        state.thought = "Waiting for user confirmation to submit the story."
+        state.response = (
+            "To submit this story, please confirm by saying something like 'log it' or 'submit story'."
+        )
+        return None
 
-        user_reply = state.user_input.strip().lower()
-        if not any(k in user_reply for k in CONFIRM_KEYWORDS_STORY):
-            logger.info("[StorySubmission] No submit confirmation found in user reply.")
-            state.thought = "Waiting for user confirmation to submit the story."
-            state.response = (
-                "To submit this story, please confirm by saying something like 'log it' or 'submit story'."
-            )
-            return state
+    state.thought = "User confirmed submission. Preparing data for Azure DevOps."
+    state.node = "story_submission_node"
+    tpl = state.story_template or {}
 
-        state.thought = "User confirmed submission. Preparing data for Azure DevOps."
-        state.node = "story_submission_node"
-        tpl = state.story_template or {}
+    # Apply normalization/defaults
+    title = tpl.get("title", "").strip() or "Untitled Story"
+    description = tpl.get("description", "").strip() or "No description provided"
+    criteria = tpl.get("acceptance_criteria", "").strip() or "N/A"
+    points_raw = tpl.get("story_points", 1)
+    try:
+        story_points = float(points_raw)
+    except Exception:
+        story_points = 1
 
-        # Apply normalization/defaults
-        title = tpl.get("title", "").strip() or "Untitled Story"
-        description = tpl.get("description", "").strip() or "No description provided"
-        criteria = tpl.get("acceptance_criteria", "").strip() or "N/A"
-        points_raw = tpl.get("story_points", 1)
-        try:
-            story_points = float(points_raw)
-        except Exception:
-            story_points = 1
+    # ADO field mapping
+    fields = {
+        "System.Title": title,
+        "System.Description": description,
+        "Microsoft.VSTS.Common.AcceptanceCriteria": criteria,
+        "Microsoft.VSTS.Scheduling.StoryPoints": story_points,
+    }
+    logger.info(f"[StorySubmission] Submitting to ADO: fields={fields}")
+    return fields
+
+def _story_submitted(state: ReasoningState, result: dict) -> ReasoningState:
+    state.thought = "Story successfully created in Azure DevOps."
+    state.response = (
+        f"Story successfully logged in Azure DevOps!\n"
+        f"• ID: {result.get('id')}\n"
+        f"• Title: {result.get('title')}\n"
+        f"• Link: {result.get('url') or 'N/A'}"
+    )
+    state.story_template = None  # Clear for next session!
+    logger.info(f"[StorySubmission] ADO create success: {result}")
+    return state
 
-        # ADO field mapping
-        fields = {
-            "System.Title": title,
-            "System.Description": description,
-            "Microsoft.VSTS.Common.AcceptanceCriteria": criteria,
-            "Microsoft.VSTS.Scheduling.StoryPoints": story_points,
-        }
+def _story_submit_failed(state: ReasoningState, e: Exception) -> ReasoningState:
+    state.thought = "Failed to submit story to Azure DevOps."
+    state.response = (
+        "Failed to submit the story to ADO. Please try again later or contact support.\n"
+        f"Error: {e}\n"
+        f"Story details: {state.story_template or {}}"
+    )
+    logger.error(f"[StorySubmission] ADO create failed: {e}")
+    return state
 
-        logger.info(f"[StorySubmission] Submitting to ADO: fields={fields}")
+def story_submission_node(): 
+    def handle(state: ReasoningState) -> ReasoningState:
+        fields = _story_fields(state)
+        if fields is None:
+            return state
         try:
-            client = ADOClient()
+            client = get_ado_client()
             result = client.create_work_item("User Story", fields)
-            state.thought = "Story successfully created in Azure DevOps."
-            state.response = (
-                f"Story successfully logged in Azure DevOps!\n"
-                f"• ID: {result.get('id')}\n"
-                f"• Title: {result.get('title')}\n"
-                f"• Link: {result.get('url') or 'N/A'}"
-            )
-            state.story_template = None  # Clear for next session!
-            logger.info(f"[StorySubmission] ADO create success: {result}")
         except Exception as e:
-            state.thought = "Failed to submit story to Azure DevOps."
-            state.response = (
-                "Failed to submit the story to ADO. Please try again later or contact support.\n"
-                f"Error: {e}\n"
-                f"Story details: {tpl}"
-            )
-            logger.error(f"[StorySubmission] ADO create failed: {e}")
+            return _story_submit_failed(state, e)
+        return _story_submitted(state, result)
 
-        return state
+    async def ahandle(state: ReasoningState) -> ReasoningState:
+        fields = _story_fields(state)
+        if fields is None:
+            return state
+        try:
+            client = get_ado_client()
+            result = await client.acreate_work_item("User Story", fields)
+        except Exception as e:
+            return _story_submit_failed(state, e)
+        return _story_submitted(state, result)
 
-    return RunnableLambda(handle)
+    return RunnableLambda(handle, afunc=ahandle)
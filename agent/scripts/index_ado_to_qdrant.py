@@ -1,8 +1,19 @@
 import os
-import requests
+import re
+import html
+import json
+import time
+import argparse
 from dotenv import load_dotenv
 
-from agent.vector.qdrant_client import add_documents, init_qdrant
+from agent.vector.ado_client import get_ado_client
+from agent.vector.ado_client import WIQL_PAGE_SIZE, WORK_ITEMS_BATCH_SIZE
+from agent.vector.qdrant_client import (
+    EMBED_BATCH_SIZE, delete_documents, encode_chunks, export_vector_snapshot, init_qdrant,
+    start_embed_pool, stop_embed_pool,
+)
+from agent.vector.bm25_index import BM25Index, BM25_INDEX_PATH
+from agent.vector.index_pipeline import INDEX_BATCH_DOCS, IndexPipeline
 
 load_dotenv()
 
@@ -11,82 +22,147 @@ ADO_ORG = os.getenv("ADO_ORGANIZATION")
 ADO_PROJECT = os.getenv("ADO_PROJECT")
 ADO_PAT = os.getenv("ADO_PAT")
 
-API_BASE = f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis"
-HEADERS = {"Content-Type": "application/json"}
-AUTH = ("", ADO_PAT)  # PAT as username (blank password)
+WORK_ITEM_TYPES = ("User Story", "Feature", "Bug")
 
-TOP_K = 200  # Index this many items per type (customize as needed)
+# Watermarks of the last successful sync (per work item type and per wiki)
+SYNC_STATE_PATH = os.getenv("ADO_SYNC_STATE", "./ado_sync_state.json")
+# Progress is saved at most this often while a sync runs (and always when a type/wiki completes)
+CHECKPOINT_SECONDS = float(os.getenv("INDEX_CHECKPOINT_SECONDS", 30))
+# Work item IDs whose details are fetched together (concurrently, in 200-ID requests)
+FETCH_WINDOW = WORK_ITEMS_BATCH_SIZE * 4
 
-# ======= Qdrant Setup =======
-init_qdrant()  # Only creates collection if not exists
+# Embedding worker processes for --embed-workers (1 = embed in this process)
+EMBED_PROCESSES = int(os.getenv("EMBED_PROCESSES", 1))
 
-def fetch_work_items(types=("User Story", "Feature", "Bug"), max_items=TOP_K):
-    wiql_types = " OR ".join([f"[System.WorkItemType] = '{t}'" for t in types])
-    wiql = {
-        "query": f"""
-        SELECT [System.Id], [System.Title], [System.Description], [System.WorkItemType]
-        FROM WorkItems
-        WHERE ({wiql_types})
-        ORDER BY [System.ChangedDate] DESC
-        """
+ado = get_ado_client(ADO_ORG, ADO_PROJECT, ADO_PAT)
+
+# Local keyword index, kept in step with the Qdrant collection; loaded in __main__, since
+# embedding worker processes re-import this module and must not touch the stores
+bm25 = None
+
+def load_sync_state(path=SYNC_STATE_PATH):
+    """
+    Sync state layout:
+      {"work_items": {type: {"changed_date": str, "ids": [int]}},
+       "wikis": {wiki_id: {"version": str, "pages": {page_id: etag}}}}
+    """
+    if not os.path.exists(path):
+        return {"work_items": {}, "wikis": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("work_items", {})
+    state.setdefault("wikis", {})
+    return state
+
+def save_sync_state(state, path=SYNC_STATE_PATH):
+    # The BM25 index is published together with the watermarks it corresponds to
+    bm25.save(BM25_INDEX_PATH)
+    # Write-then-rename so an interrupted run never leaves a half-written state file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+_last_checkpoint = 0.0
+
+def checkpoint(state, force=False):
+    """Saves sync state if CHECKPOINT_SECONDS passed since the last save, or if forced."""
+    global _last_checkpoint
+    if force or time.monotonic() - _last_checkpoint >= CHECKPOINT_SECONDS:
+        save_sync_state(state)
+        _last_checkpoint = time.monotonic()
+
+def print_stats(label, stats):
+    for stage, s in stats.items():
+        print(f"  {label} {stage}: {s['items']} items in {s['seconds']}s ({s['per_second']}/s)")
+
+def _to_item(wi):
+    fields = wi.get("fields", {})
+    return {
+        "id": wi.get("id"),
+        "title": fields.get("System.Title", ""),
+        "description": fields.get("System.Description", ""),
+        "type": fields.get("System.WorkItemType", ""),
+        "status": fields.get("System.State", ""),
+        "changed_date": fields.get("System.ChangedDate", ""),
+        "rev": wi.get("rev"),
+        "source": "work_item"
     }
-    url = f"{API_BASE}/wit/wiql?api-version=7.1-preview.2"
-    resp = requests.post(url, auth=AUTH, headers=HEADERS, json=wiql, timeout=10)
-    print("WORK ITEMS STATUS:", resp.status_code)
-    work_items = resp.json().get("workItems", []) if resp.status_code == 200 else []
-    ids = [str(wi["id"]) for wi in work_items[:max_items]]
-
-    if not ids:
-        return []
-    details_url = f"{API_BASE}/wit/workitems?ids={','.join(ids)}&$expand=fields&api-version=7.1-preview.3"
-    details_resp = requests.get(details_url, auth=AUTH, headers=HEADERS, timeout=10)
-    print("WORK ITEM DETAILS STATUS:", details_resp.status_code)
-    items = []
-    for wi in details_resp.json().get("value", []):
-        fields = wi.get("fields", {})
-        items.append({
-            "id": wi.get("id"),
-            "title": fields.get("System.Title", ""),
-            "description": fields.get("System.Description", ""),
-            "type": fields.get("System.WorkItemType", ""),
-            "source": "work_item"
-        })
-    return items
-
-def fetch_all_known_wiki_pages(wiki_id, max_id=10):
-    items = []
-    for page_id in range(1, max_id+1):  # Try IDs 1 to max_id
-        content_url = f"{API_BASE}/wiki/wikis/{wiki_id}/pages/{page_id}?includeContent=True&api-version=7.1-preview.1"
-        content_resp = requests.get(content_url, auth=AUTH, headers=HEADERS, timeout=10)
-        print(f"FETCHING PAGE {page_id} for wiki {wiki_id}: {content_resp.status_code}")
-        if content_resp.status_code != 200:
-            continue  # Skip missing/invalid pages
-        content = content_resp.json().get("content", "")
+
+def fetch_work_items(types=WORK_ITEM_TYPES, max_items=None, changed_since=None):
+    """
+    Yields work items of the given types, oldest change first.
+    If `changed_since` is set, only items with System.ChangedDate >= changed_since are returned.
+    IDs are queried WIQL_PAGE_SIZE at a time, keyed on (ChangedDate, Id) after the last item
+    yielded; details are fetched FETCH_WINDOW IDs at a time, so only one window is held in memory.
+    """
+    wiql_types = " OR ".join([f"[System.WorkItemType] = '{t}'" for t in types])
+    where = f"({wiql_types})"
+    if changed_since:
+        where += f" AND [System.ChangedDate] >= '{changed_since}'"
+    yielded, last = 0, None
+    while max_items is None or yielded < max_items:
+        page_where = where
+        if last:
+            changed, wid = last["changed_date"], last["id"]
+            page_where += (
+                f" AND ([System.ChangedDate] > '{changed}'"
+                f" OR ([System.ChangedDate] = '{changed}' AND [System.Id] > {wid}))"
+            )
+        ids = ado.query_work_item_ids(
+            page_where, order_by="[System.ChangedDate] ASC, [System.Id] ASC", top=WIQL_PAGE_SIZE
+        ) or []
+        print(f"WORK ITEMS MATCHED ({', '.join(types)}): {len(ids)}{' more' if last else ''}")
+        page = ids if max_items is None else ids[:max_items - yielded]
+        for start in range(0, len(page), FETCH_WINDOW):
+            window = page[start:start + FETCH_WINDOW]
+            items = [_to_item(wi) for wi in ado.get_work_items(window)]
+            # If a batch failed, stop at the first gap so the ChangedDate watermark never skips items
+            for pos, wid in enumerate(window):
+                if pos >= len(items) or items[pos]["id"] != wid:
+                    print(f"WORK ITEM DETAILS INCOMPLETE: stopping after {yielded + start + pos} items")
+                    yield from items[:pos]
+                    return
+            yield from items
+            last = items[-1]
+        yielded += len(page)
+        if len(ids) < WIQL_PAGE_SIZE:
+            return
+
+def fetch_work_item_ids(work_item_type):
+    """Returns the IDs of all work items of a type that currently exist in ADO, or None on failure."""
+    ids = ado.list_work_item_ids(f"[System.WorkItemType] = '{work_item_type}'")
+    return set(ids) if ids is not None else None
+
+def fetch_wiki_pages(wiki_id, listing, known_pages=None, failed=None):
+    """
+    Yields the pages of a wiki listing that changed since `known_pages` ({page_id: etag}),
+    with their full content. Unchanged pages are skipped; page IDs whose fetch failed are
+    appended to `failed`, so the wiki is revisited on the next run.
+    """
+    known_pages = known_pages or {}
+    for page in listing:
+        page_id = str(page["id"])
+        fetched = ado.get_wiki_page(wiki_id, page_id, etag=known_pages.get(page_id))
+        if fetched is None:
+            print(f"FETCHING PAGE {page_id} for wiki {wiki_id}: failed")
+            if failed is not None:
+                failed.append(page_id)
+            continue
+        if fetched.get("not_modified"):
+            continue
         # Path/title logic (fallback for home pages)
-        title = content_resp.json().get("path", "").strip("/").split("/")[-1] or f"Page {page_id}"
-        items.append({
+        title = (fetched.get("path") or page.get("path", "")).strip("/").split("/")[-1] or f"Page {page_id}"
+        yield {
             "id": f"{wiki_id}:{page_id}",
+            "page_id": page_id,
             "title": title,
-            "description": content[:1500],
+            # Full page: chunking keeps everything past the model's input limit
+            "description": fetched.get("content") or "",
             "type": "Wiki",
-            "source": "wiki"
-        })
-    return items
-
-def fetch_wiki_pages_fixed_bruteforce(max_pages=10):
-    wikis_url = f"{API_BASE}/wiki/wikis?api-version=7.1-preview.1"
-    wikis_resp = requests.get(wikis_url, auth=AUTH, headers=HEADERS, timeout=10)
-    print("WIKIS STATUS:", wikis_resp.status_code)
-    print("WIKIS RESPONSE:", wikis_resp.json())
-    items = [] 
-    if wikis_resp.status_code == 200:
-        for wiki in wikis_resp.json().get("value", []):
-            wiki_id = wiki.get("id")  # This is the GUID!
-            print(f"Fetching ALL pages (ID brute force) for wiki id: {wiki_id}")
-            items.extend(fetch_all_known_wiki_pages(wiki_id, max_id=max_pages))
-    else:
-        print("Failed to fetch wikis. Response:", wikis_resp.text)
-    return items
+            "source": "wiki",
+            "etag": fetched.get("etag"),
+        }
 
 def build_docs_and_meta(items):
     docs = []
@@ -98,31 +174,161 @@ def build_docs_and_meta(items):
             "id": i["id"],
             "title": i.get("title", ""),
             "type": i.get("type", ""),
+            "work_item_type": i.get("type", ""),
+            "status": i.get("status", ""),
             "source": i.get("source", ""),
         })
     return docs, meta
 
-if __name__ == "__main__":
-    print("Fetching work items from ADO...")
-    stories = fetch_work_items()
-    print(f"Fetched {len(stories)} stories/bugs/features.")
-    if stories:
-        print("First work item meta:", stories[0])
-
-    print("Fetching wiki pages from ADO (using brute-force by page id)...")
-    # Set max_pages to the highest page_id you have in your wiki, or just try 10/20
-    wikis = fetch_wiki_pages_fixed_bruteforce(max_pages=10)
-    print(f"Fetched {len(wikis)} wiki pages.")
-    if wikis:
-        print("First wiki meta:", wikis[0])
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def clean_item(item):
+    """
+    Pipeline clean stage: one fetched item -> (doc text, payload metadata).
+    Work item descriptions are HTML; they are reduced to plain text before embedding.
+    """
+    description = item.get("description") or ""
+    if item.get("source") == "work_item":
+        description = " ".join(html.unescape(_TAG_RE.sub(" ", description)).split())
+    docs, meta = build_docs_and_meta([{**item, "description": description}])
+    return docs[0], meta[0]
+
+def sync_work_items(state, pipeline, full=False):
+    """Re-embeds changed work items per work item type and deletes items that no longer exist."""
+    current = {wtype: fetch_work_item_ids(wtype) for wtype in WORK_ITEM_TYPES}
+
+    # An item whose type changed is still current (under its new type), so only IDs missing
+    # from every type are deleted; if any listing failed, deletions wait for the next run
+    if any(ids is None for ids in current.values()):
+        print("Could not list every work item type, not deleting removed items this run.")
     else:
-        print("NO wiki docs fetched from ADO. Fix this first.")
-
-    all_items = stories + wikis
-    docs, meta = build_docs_and_meta(all_items)
-    print(f"Indexing {len(docs)} docs to Qdrant...")
-    for idx, m in enumerate(meta):
-        if m["source"] == "wiki":
-            print(f"WIKI META [{idx}]: {m}")
-    add_documents(docs, meta)
-    print(" Semantic index complete!")
+        all_current = set().union(*current.values())
+        known = {i for type_state in state["work_items"].values() for i in type_state.get("ids", [])}
+        removed = sorted(known - all_current)
+        if removed:
+            print(f"Deleting {len(removed)} removed work items from Qdrant...")
+            delete_documents(removed)
+            bm25.remove_documents(removed)
+
+    for wtype in WORK_ITEM_TYPES:
+        type_state = state["work_items"].get(wtype, {})
+        watermark = None if full else type_state.get("changed_date")
+        known_ids = set(type_state.get("ids", []))
+
+        current_ids = current[wtype]
+        if current_ids is None:
+            print(f"Could not list {wtype} items, skipping this type.")
+            continue
+
+        ids = known_ids & current_ids
+        type_state = {"changed_date": watermark, "ids": sorted(ids)}
+        state["work_items"][wtype] = type_state
+
+        def on_batch(items, docs, meta):
+            # Items arrive in ChangedDate order, so the last one of a batch is the new watermark
+            bm25.add_documents(docs, meta)
+            ids.update(i["id"] for i in items)
+            type_state["ids"] = sorted(ids)
+            type_state["changed_date"] = items[-1]["changed_date"]
+            checkpoint(state)
+
+        stats = pipeline.run(fetch_work_items(types=(wtype,), changed_since=watermark), on_batch)
+        print(f"{wtype}: {stats['clean']['items']} changed since {watermark or 'beginning'}, {stats['upsert']['items']} chunks embedded.")
+        print_stats(wtype, stats)
+        checkpoint(state, force=True)
+
+def sync_wikis(state, pipeline, full=False):
+    """Re-embeds changed wiki pages and deletes removed pages/wikis, per wiki."""
+    wikis = ado.list_wikis()
+    if wikis is None:
+        print("Failed to fetch wikis, skipping wiki sync.")
+        return
+    seen_wikis = set()
+    for wiki in wikis:
+        wiki_id = wiki.get("id")  # This is the GUID!
+        seen_wikis.add(wiki_id)
+        wiki_state = state["wikis"].get(wiki_id, {})
+        version = ado.get_wiki_version(wiki)
+        if not full and version and version == wiki_state.get("version"):
+            print(f"Wiki {wiki_id} unchanged (version {version}), skipping.")
+            continue
+
+        print(f"Fetching pages for wiki id: {wiki_id}")
+        listing = ado.list_wiki_pages(wiki_id)
+        if listing is None:
+            print(f"Could not list pages of wiki {wiki_id}, skipping this wiki.")
+            continue
+        current_page_ids = {str(p["id"]) for p in listing}
+        known_pages = wiki_state.get("pages", {})
+        removed = [f"{wiki_id}:{pid}" for pid in known_pages if pid not in current_page_ids]
+        if removed:
+            delete_documents(removed)
+            bm25.remove_documents(removed)
+
+        # The version watermark is only recorded once every page is in; until then an
+        # interrupted run resumes from the page ETags checkpointed so far
+        pages = {pid: etag for pid, etag in known_pages.items() if pid in current_page_ids}
+        state["wikis"][wiki_id] = {"version": None, "pages": pages}
+        failed = []
+
+        def on_batch(items, docs, meta):
+            bm25.add_documents(docs, meta)
+            pages.update({p["page_id"]: p["etag"] for p in items})
+            checkpoint(state)
+
+        source = fetch_wiki_pages(wiki_id, listing, known_pages=None if full else known_pages, failed=failed)
+        stats = pipeline.run(source, on_batch)
+        print(f"Wiki {wiki_id}: {len(listing)} pages, {stats['clean']['items']} changed, {len(removed)} removed.")
+        print_stats(f"wiki {wiki_id}", stats)
+        state["wikis"][wiki_id]["version"] = None if failed else version
+        checkpoint(state, force=True)
+
+    for wiki_id in list(state["wikis"]):
+        if wiki_id not in seen_wikis:
+            pages = state["wikis"].pop(wiki_id).get("pages", {})
+            print(f"Wiki {wiki_id} no longer exists, deleting {len(pages)} pages.")
+            delete_documents([f"{wiki_id}:{pid}" for pid in pages])
+            bm25.remove_documents([f"{wiki_id}:{pid}" for pid in pages])
+            checkpoint(state, force=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync ADO work items and wiki pages into Qdrant.")
+    parser.add_argument("--full", action="store_true", help="Ignore stored watermarks and re-index everything.")
+    parser.add_argument("--no-snapshot", action="store_true", help="Do not publish a read snapshot after syncing.")
+    parser.add_argument("--embed-workers", type=int, default=EMBED_PROCESSES, help="Embedding worker processes (1 = in-process).")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding forward pass.")
+    parser.add_argument("--batch-docs", type=int, default=INDEX_BATCH_DOCS, help="Documents per pipeline batch (embed + upsert).")
+    args = parser.parse_args()
+
+    # ======= Qdrant Setup =======
+    init_qdrant()  # Creates the collection, or migrates its storage settings and payload indexes
+    bm25 = BM25Index.load(BM25_INDEX_PATH)
+
+    state = load_sync_state()
+    if not args.full and not len(bm25) and (state["work_items"] or state["wikis"]):
+        # Incremental runs only touch changed documents; build the keyword index once from scratch
+        print("No BM25 index yet, running a full sync to build it.")
+        args.full = True
+    mode = "full" if args.full else "incremental"
+    pipeline = IndexPipeline(
+        clean_item,
+        batch_docs=args.batch_docs,
+        encode=lambda chunk_docs: encode_chunks(chunk_docs, batch_size=args.embed_batch_size),
+    )
+    if args.embed_workers > 1:
+        print(f"Starting {args.embed_workers} embedding worker processes...")
+        start_embed_pool(args.embed_workers)
+    try:
+        print(f"Syncing work items from ADO ({mode})...")
+        sync_work_items(state, pipeline, full=args.full)
+
+        print(f"Syncing wiki pages from ADO ({mode})...")
+        sync_wikis(state, pipeline, full=args.full)
+    finally:
+        stop_embed_pool()
+
+    if not args.no_snapshot:
+        print("Publishing vector snapshot...")
+        print(f"Snapshot published: {export_vector_snapshot()}")
+
+    print(" Semantic index sync complete!")
@@ -0,0 +1,177 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", 5000))
+INTENT_CACHE_TTL_SECONDS = float(os.getenv("INTENT_CACHE_TTL_SECONDS", 3600))
+# Cosine similarity above which a differently worded message counts as the same question
+INTENT_CACHE_SIMILARITY = float(os.getenv("INTENT_CACHE_SIMILARITY", 0.95))
+# How many trailing history lines make up the "context" part of the key
+INTENT_CACHE_HISTORY_LINES = int(os.getenv("INTENT_CACHE_HISTORY_LINES", 2))
+
+class IntentCache:
+    """
+    Cache of LLM intent labels, in front of the classifier's LLM call.
+
+    - Exact tier: normalized input + hash of the last few history lines.
+    - Semantic tier: among entries with the same history hash, the nearest input embedding
+      with cosine similarity >= `similarity` (e.g. "dashboard filter not working" vs
+      "dashboard filter isn't working").
+
+    Entries older than `ttl_seconds` are never served; beyond `max_entries` the least recently
+    used go first. Input vectors live in one preallocated matrix, so the semantic tier is a
+    single matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = INTENT_CACHE_SIZE,
+        ttl_seconds: float = INTENT_CACHE_TTL_SECONDS,
+        similarity: float = INTENT_CACHE_SIMILARITY,
+        history_lines: int = INTENT_CACHE_HISTORY_LINES,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.history_lines = history_lines
+        # key -> (label, history_hash, vector slot or None, stored_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Semantic tier: one row per slot, allocated on the first vector (its size sets the dim).
+        # Unused slots have history hash -1 and never match.
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_history = np.full(max_entries, -1, dtype=np.int64)
+        self._slot_stored = np.zeros(max_entries, dtype=np.float64)
+        self._slot_keys: List[Optional[str]] = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._swept_at = 0.0
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split()).lower().strip(" .!?")
+
+    def history_hash(self, history: str) -> int:
+        lines = [l for l in (history or "").splitlines() if l.strip()]
+        recent = "\n".join(lines[-self.history_lines:]) if self.history_lines else ""
+        return int(hashlib.sha1(recent.encode("utf-8")).hexdigest()[:15], 16)
+
+    def _key(self, user_input: str, history_hash: int) -> str:
+        return f"{history_hash:x}:{self.normalize(user_input)}"
+
+    @staticmethod
+    def _unit(vector) -> Optional[np.ndarray]:
+        if vector is None:
+            return None
+        vec = np.asarray(vector, dtype=np.float32)
+        return vec / (np.linalg.norm(vec) or 1.0)
+
+    def _drop(self, key: str):
+        _, _, slot, _ = self._entries.pop(key)
+        if slot is not None:
+            self._slot_history[slot] = -1
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return now - stored_at > self.ttl_seconds
+
+    def _sweep(self, now: float):
+        # Lookups check age themselves; this only reclaims memory from stale entries
+        if now - self._swept_at < 60:
+            return
+        self._swept_at = now
+        for key in [k for k, entry in self._entries.items() if self._expired(entry[3], now)]:
+            self._drop(key)
+
+    def _nearest(self, query: np.ndarray, history_hash: int, now: float) -> Optional[str]:
+        if self._matrix is None or query.shape[0] != self._matrix.shape[1]:
+            return None
+        valid = (self._slot_history == history_hash) & (now - self._slot_stored <= self.ttl_seconds)
+        if not valid.any():
+            return None
+        sims = np.where(valid, self._matrix @ query, -np.inf)
+        slot = int(np.argmax(sims))
+        return self._slot_keys[slot] if sims[slot] >= self.similarity else None
+
+    def get(self, user_input: str, history: str, vector=None) -> Optional[str]:
+        """Returns a cached label, or None. `vector` (the input embedding) enables the semantic tier."""
+        history_hash = self.history_hash(history)
+        key = self._key(user_input, history_hash)
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[3], now):
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[0]
+
+            query = self._unit(vector)
+            if query is not None:
+                best_key = self._nearest(query, history_hash, now)
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    return self._entries[best_key][0]
+
+            self.misses += 1
+            return None
+
+    def put(self, user_input: str, history: str, label: str, vector=None):
+        history_hash = self.history_hash(history)
+        key = self._key(user_input, history_hash)
+        unit = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            while len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+            slot = None
+            if unit is not None:
+                if self._matrix is None:
+                    self._matrix = np.zeros((self.max_entries, unit.shape[0]), dtype=np.float32)
+                if unit.shape[0] == self._matrix.shape[1]:
+                    slot = self._free_slots.pop()
+                    self._matrix[slot] = unit
+                    self._slot_history[slot] = history_hash
+                    self._slot_stored[slot] = now
+                    self._slot_keys[slot] = key
+            self._entries[key] = (label, history_hash, slot, now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._swept_at = 0.0
+            self._sweep(time.monotonic())
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+_intent_cache: Optional[IntentCache] = None
+_intent_cache_lock = threading.Lock()
+
+def get_intent_cache() -> IntentCache:
+    """Process-wide intent label cache."""
+    global _intent_cache
+    if _intent_cache is None:
+        with _intent_cache_lock:
+            if _intent_cache is None:
+                _intent_cache = IntentCache()
+    return _intent_cache
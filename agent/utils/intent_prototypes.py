@@ -0,0 +1,224 @@
+import os
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INTENT_EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "..", "prompts", "intent.json")
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else None
+
+INTENT_PROTO_ENABLED = os.getenv("INTENT_PROTO_ENABLED", "true").lower() == "true"
+# Accept the fast path only if the best label is similar enough and clearly ahead of the runner-up.
+# Unset (default), both are calibrated when the examples are embedded; set them to pin a value.
+INTENT_PROTO_THRESHOLD = _env_float("INTENT_PROTO_THRESHOLD")
+INTENT_PROTO_MARGIN = _env_float("INTENT_PROTO_MARGIN")
+INTENT_PROTO_TOP_K = int(os.getenv("INTENT_PROTO_TOP_K", 3))
+# Calibration picks the (threshold, margin) that decides the most held-out examples while
+# labeling at least this share of the decided ones correctly
+INTENT_PROTO_PRECISION = float(os.getenv("INTENT_PROTO_PRECISION", 0.95))
+# Every n-th example of each label is held out of the prototypes for calibration
+INTENT_PROTO_HOLDOUT_EVERY = int(os.getenv("INTENT_PROTO_HOLDOUT_EVERY", 4))
+
+_THRESHOLD_GRID = np.round(np.arange(0.30, 0.951, 0.01), 2)
+_MARGIN_GRID = np.round(np.arange(0.0, 0.301, 0.01), 2)
+
+# intent.json groups that map onto graph intents
+LABEL_MAP = {
+    "farewell": "greeting",
+    "web_search": "general_chat",  # general_chat decides on web search itself
+}
+
+# Sentence-level examples (the same ones the LLM classifier prompt uses), on top of intent.json
+EXTRA_EXAMPLES = {
+    "product_question": ["How do I add a filter to the dashboard?", "Why is the export button not working?"],
+    "bug_log": ["Please log a bug: the upload button crashes", "The save button throws an error, report this bug"],
+    "story_log": ["Create a new story for user onboarding", "Add a story so users can export reports to PDF"],
+    "general_chat": ["What's the weather?", "Tell me something funny"],
+    "greeting": ["Thanks, bye!", "Hi there, good morning"],
+}
+
+def _label_scores(sims: np.ndarray, label_rows: List[np.ndarray], top_k: int) -> np.ndarray:
+    """(queries, examples) similarities -> (queries, labels): mean of each label's top_k."""
+    columns = []
+    for rows in label_rows:
+        label_sims = sims[:, rows]
+        k = min(top_k, label_sims.shape[1])
+        columns.append(np.partition(label_sims, -k, axis=1)[:, -k:].mean(axis=1))
+    return np.stack(columns, axis=1)
+
+class PrototypeIntentClassifier:
+    """
+    Fast local intent stage in front of the LLM classifier. Each labeled example is embedded
+    once with the shared MiniLM model; an input is scored per label by the mean cosine
+    similarity of its `top_k` nearest examples. The label is returned only when it clears
+    `threshold` and leads the runner-up by `margin`, otherwise the caller asks the LLM.
+
+    A threshold or margin left as None is calibrated on a held-out split of the examples
+    (see `calibrate`); if no setting reaches `precision`, every input goes to the LLM.
+    """
+
+    def __init__(
+        self,
+        examples: Dict[str, List[str]],
+        threshold: Optional[float] = INTENT_PROTO_THRESHOLD,
+        margin: Optional[float] = INTENT_PROTO_MARGIN,
+        top_k: int = INTENT_PROTO_TOP_K,
+        precision: float = INTENT_PROTO_PRECISION,
+        holdout_every: int = INTENT_PROTO_HOLDOUT_EVERY,
+        encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+    ):
+        self.examples = examples
+        self.threshold = threshold
+        self.margin = margin
+        self.top_k = top_k
+        self.precision = precision
+        self.holdout_every = holdout_every
+        self._encode = encode
+        self._labels: List[str] = []
+        self._label_names: List[str] = list(examples)
+        self._label_rows: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self.calibration: Dict = {}
+        self.decided = 0
+        self.deferred = 0
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        if self._encode is not None:
+            vectors = np.asarray(self._encode(texts), dtype=np.float32)
+            return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        from agent.vector.qdrant_client import get_model
+        return np.asarray(get_model().encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    def encode_examples(self):
+        """Embeds the labeled examples (and calibrates) once; later calls are no-ops."""
+        if self._matrix is not None:
+            return
+        with self._lock:
+            if self._matrix is not None:
+                return
+            labels, texts = [], []
+            for label, items in self.examples.items():
+                labels.extend([label] * len(items))
+                texts.extend(items)
+            matrix = self._encode_texts(texts)
+            if self.threshold is None or self.margin is None:
+                self.calibrate(matrix, labels)
+            self._labels = labels
+            self._label_rows = [np.array([i for i, l in enumerate(labels) if l == label]) for label in self._label_names]
+            self._matrix = matrix
+            logger.info(
+                f"[IntentPrototypes] Encoded {len(texts)} examples for {len(self.examples)} intents "
+                f"(threshold {self.threshold}, margin {self.margin})"
+            )
+
+    def calibrate(self, matrix: np.ndarray, labels: List[str]):
+        """
+        Holds out every `holdout_every`-th example of each label, scores the held-out ones
+        against prototypes built from the rest, and picks the (threshold, margin) grid point
+        that decides the most of them at `precision` or better (ties: the stricter setting).
+        """
+        held = np.zeros(len(labels), dtype=bool)
+        for label in self._label_names:
+            rows = [i for i, l in enumerate(labels) if l == label]
+            held[rows[self.holdout_every - 1::self.holdout_every]] = True
+        train = np.flatnonzero(~held)
+        train_labels = [labels[i] for i in train]
+        label_rows = [np.array([j for j, l in enumerate(train_labels) if l == label]) for label in self._label_names]
+        if not held.any() or any(len(rows) == 0 for rows in label_rows):
+            logger.warning("[IntentPrototypes] Too few examples to calibrate, deferring every input to the LLM")
+            self.threshold = np.inf if self.threshold is None else self.threshold
+            self.margin = np.inf if self.margin is None else self.margin
+            return
+
+        scores = _label_scores(matrix[held] @ matrix[train].T, label_rows, self.top_k)
+        ranked = np.sort(scores, axis=1)
+        best, lead = ranked[:, -1], ranked[:, -1] - ranked[:, -2]
+        correct = np.array(self._label_names)[scores.argmax(axis=1)] == np.array(labels)[held]
+
+        thresholds = [self.threshold] if self.threshold is not None else _THRESHOLD_GRID
+        margins = [self.margin] if self.margin is not None else _MARGIN_GRID
+        chosen = None  # (decided, threshold, margin, precision)
+        for threshold in thresholds:
+            for margin in margins:
+                accept = (best >= threshold) & (lead >= margin)
+                decided = int(accept.sum())
+                if not decided or correct[accept].mean() < self.precision:
+                    continue
+                if chosen is None or decided >= chosen[0]:
+                    chosen = (decided, float(threshold), float(margin), float(correct[accept].mean()))
+        if chosen is None:
+            logger.warning(f"[IntentPrototypes] No threshold reaches {self.precision:.0%} precision, deferring every input to the LLM")
+            self.threshold = np.inf if self.threshold is None else self.threshold
+            self.margin = np.inf if self.margin is None else self.margin
+            self.calibration = {"held_out": int(held.sum()), "coverage": 0.0, "precision": None}
+            return
+        decided, self.threshold, self.margin, precision = chosen
+        self.calibration = {
+            "held_out": int(held.sum()),
+            "coverage": round(decided / int(held.sum()), 3),
+            "precision": round(precision, 3),
+        }
+
+    def scores(self, vector) -> Dict[str, float]:
+        """Per-label score for an input embedding."""
+        self.encode_examples()
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        row = _label_scores((self._matrix @ query)[None, :], self._label_rows, self.top_k)[0]
+        return dict(zip(self._label_names, row.tolist()))
+
+    def decide(self, vector) -> Tuple[Optional[str], float]:
+        """Returns (label, score), or (None, score) when the LLM should be consulted."""
+        ranked = sorted(self.scores(vector).items(), key=lambda kv: kv[1], reverse=True)
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best_score >= self.threshold and best_score - runner_up >= self.margin:
+            self.decided += 1
+            return best, best_score
+        self.deferred += 1
+        return None, best_score
+
+    def stats(self) -> dict:
+        total = self.decided + self.deferred
+        return {
+            "enabled": INTENT_PROTO_ENABLED,
+            "examples": len(self._labels),
+            # None until calibrated; inf (reported as None too) when the fast path is off
+            "threshold": self.threshold if self.threshold is not None and np.isfinite(self.threshold) else None,
+            "margin": self.margin if self.margin is not None and np.isfinite(self.margin) else None,
+            "calibration": self.calibration,
+            "decided": self.decided,
+            "deferred_to_llm": self.deferred,
+            "fast_path_rate": self.decided / total if total else 0.0,
+        }
+
+def load_examples(path: str = INTENT_EXAMPLES_PATH) -> Dict[str, List[str]]:
+    """Labeled examples from intent.json (mapped to graph intents) plus EXTRA_EXAMPLES."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    examples: Dict[str, List[str]] = {}
+    for group, items in raw.items():
+        examples.setdefault(LABEL_MAP.get(group, group), []).extend(items)
+    for label, items in EXTRA_EXAMPLES.items():
+        examples.setdefault(label, []).extend(items)
+    return examples
+
+_classifier: Optional[PrototypeIntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+def get_intent_classifier() -> PrototypeIntentClassifier:
+    """Process-wide prototype classifier; examples are embedded on first use (or during warmup)."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = PrototypeIntentClassifier(load_examples())
+    return _classifier
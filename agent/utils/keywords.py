@@ -0,0 +1,111 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable
+
+# Single source of truth for the keyword lists the nodes react to. Matching is on whole
+# words only, so "hi" matches neither "this" nor "his"; plurals that should count are listed.
+KEYWORDS: Dict[str, list] = {
+    # Explicit confirmation to submit a drafted bug / story
+    "confirm_bug": [
+        "log it", "submit", "submit bug", "log bug", "log this bug", "create bug", "raise bug", "file bug",
+        "add as bug", "please file a bug", "new bug", "add this as a bug", "report this bug",
+        "confirm bug", "file this bug", "file as bug",
+    ],
+    "confirm_story": [
+        "log it", "submit", "submit story", "log story", "create story",
+        "raise story", "file story", "raise ticket", "log ticket", "add as story",
+        "make a story", "please file a story", "new story",
+    ],
+    "greeting": [
+        "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+        "thanks", "thank you", "bye", "goodbye", "see you", "take care", "welcome",
+    ],
+    # Product context; used to bias unclear classifications away from clarify/general chat
+    "product": [
+        "entity", "page", "visible", "dashboard", "login", "bug", "story", "feature", "button", "screen", "form",
+        "profile", "app", "application", "submit", "status", "error", "issue", "report", "not working", "unable",
+        "entities", "pages", "dashboards", "bugs", "stories", "features", "buttons", "screens", "forms",
+        "profiles", "apps", "applications", "errors", "issues", "reports",
+    ],
+    "product_trigger": [
+        "login", "dashboard", "feature", "app", "button", "upload", "ui", "form", "page", "account",
+        "profile", "report", "error", "issue", "workflow", "search", "submit", "reset", "settings",
+        "dashboards", "features", "buttons", "uploads", "forms", "pages", "accounts", "profiles", "reports",
+        "errors", "issues", "workflows",
+    ],
+    # Follow-ups asking for details of (or acting on) the entity shown last turn
+    "yes": [
+        "yes", "show me", "details", "see it", "more info", "see details", "show details", "yep", "of course",
+        "log", "log it", "please log",
+    ],
+    "log_bug": ["create bug", "file bug", "new bug", "add bug"],
+    "log_story": ["create story", "file story", "new story", "add story"],
+    # Mentions that make a product answer offer to log a bug / story
+    "bug_mention": [
+        "bug", "issue", "defect", "error", "not working", "fail", "failed", "failing", "unable",
+        "bugs", "issues", "defects", "errors", "fails",
+    ],
+    "story_mention": ["story", "feature", "enhancement", "request", "stories", "features", "enhancements", "requests"],
+}
+
+class KeywordMatcher:
+    """
+    Matches every keyword category in one regex pass over the input.
+
+    All phrases go into a single compiled alternation (longest first) inside a lookahead, so
+    the scan reports the longest phrase starting at each word. Shorter phrases contained in
+    it ("log" in "log it") are accounted for up front: each phrase maps to the categories of
+    every phrase it contains.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        phrase_categories: Dict[str, set] = {}
+        for category, phrases in categories.items():
+            for phrase in phrases:
+                phrase_categories.setdefault(phrase.lower(), set()).add(category)
+
+        phrases = sorted(phrase_categories, key=len, reverse=True)
+        self._categories: Dict[str, FrozenSet[str]] = {}
+        for phrase in phrases:
+            found = set()
+            for other in phrases:
+                if len(other) <= len(phrase) and re.search(rf"\b{re.escape(other)}\b", phrase):
+                    found |= phrase_categories[other]
+            self._categories[phrase] = frozenset(found)
+
+        alternation = "|".join(re.escape(p) for p in phrases)
+        self._pattern = re.compile(rf"(?=\b({alternation})\b)")
+        self._edge_patterns = {}
+        for category, items in categories.items():
+            alts = "|".join(re.escape(p.lower()) for p in sorted(items, key=len, reverse=True))
+            self._edge_patterns[category] = re.compile(rf"^(?:{alts})(?:\s|$)|\s(?:{alts})$")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.lower().split()).strip(" .,!?")
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """All categories with at least one whole-word phrase in `text`."""
+        found = set()
+        for m in self._pattern.finditer(self.normalize(text)):
+            found |= self._categories[m.group(1)]
+        return frozenset(found)
+
+    def at_edges(self, text: str, category: str) -> bool:
+        """True if `text` is, starts with or ends with a phrase of `category` (e.g. "hi there", "ok thanks")."""
+        return bool(self._edge_patterns[category].search(self.normalize(text)))
+
+_matcher = KeywordMatcher(KEYWORDS)
+
+@lru_cache(maxsize=2048)
+def match_keywords(text: str) -> FrozenSet[str]:
+    """Categories matched in `text`; cached, so several checks on the same turn cost one scan."""
+    return _matcher.match(text)
+
+def has_keywords(text: str, *categories: str) -> bool:
+    """True if `text` matches any of the given categories."""
+    matched = match_keywords(text)
+    return any(c in matched for c in categories)
+
+def keywords_at_edges(text: str, category: str) -> bool:
+    return _matcher.at_edges(text, category)
@@ -1,26 +1,258 @@
 import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 
 load_dotenv()
 
-# Create endpoint and model instances (token automatically picked from env var)
-llm = HuggingFaceEndpoint(
-    repo_id=os.getenv("LLM_MODEL"),
-    task="text-generation"
-)
-model = ChatHuggingFace(llm=llm)
+class LLMResponseCache:
+    """
+    Cache of final LLM answers, keyed on model ID + message list + generation params.
+    In-memory LRU, plus an optional SQLite file (`disk_path`) so answers survive restarts and
+    are shared by workers. Entries older than `ttl_seconds` (0 = never) are ignored.
+    Only calls that opt in (cache=True) read or write it.
+    """
+
+    def __init__(self, max_entries: int = 1000, disk_path: Optional[str] = None, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.ttl_seconds = ttl_seconds
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (text, stored_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        if disk_path:
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(model_id: str, messages, params: dict) -> str:
+        if isinstance(messages, str):
+            normalized = [["human", messages]]
+        else:
+            normalized = [[getattr(m, "type", "human"), getattr(m, "content", m)] for m in messages]
+        payload = json.dumps([model_id, normalized, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _fresh(self, stored_at: float) -> bool:
+        return not self.ttl_seconds or time.time() - stored_at <= self.ttl_seconds
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and self._fresh(entry[1]):
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT response, stored_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row and self._fresh(row[1]):
+            self._remember(key, row[0], row[1])
+            with self._lock:
+                self.hits += 1
+            return row[0]
+        return None
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        text = self._memory_get(key)
+        if text is None and self.disk_path:
+            text = self._disk_get(key)
+        if text is None:
+            self._miss()
+        return text
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like get, but the SQLite tier (which may wait on other workers' writes) runs in a thread."""
+        text = self._memory_get(key)
+        if text is None and self.disk_path:
+            text = await asyncio.to_thread(self._disk_get, key)
+        if text is None:
+            self._miss()
+        return text
+
+    def _remember(self, key: str, text: str, stored_at: float):
+        with self._lock:
+            self._lru[key] = (text, stored_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _disk_put(self, key: str, text: str, stored_at: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response, stored_at) VALUES (?, ?, ?)", (key, text, stored_at)
+        )
+
+    def put(self, key: str, text: str):
+        stored_at = time.time()
+        self._remember(key, text, stored_at)
+        if self.disk_path:
+            self._disk_put(key, text, stored_at)
+
+    async def aput(self, key: str, text: str):
+        stored_at = time.time()
+        self._remember(key, text, stored_at)
+        if self.disk_path:
+            await asyncio.to_thread(self._disk_put, key, text, stored_at)
+
+    def _disk_discard(self, key: str):
+        self._conn().execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def discard(self, key: str):
+        with self._lock:
+            self._lru.pop(key, None)
+        if self.disk_path:
+            self._disk_discard(key)
+
+    async def adiscard(self, key: str):
+        with self._lock:
+            self._lru.pop(key, None)
+        if self.disk_path:
+            await asyncio.to_thread(self._disk_discard, key)
 
-def call_llm(messages, stream=False):
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "memory_entries": len(self._lru),
+                "max_entries": self.max_entries,
+                "disk_path": self.disk_path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+_model = None
+_llm_cache = None
+_model_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide LLM response cache (LLM_CACHE_SIZE, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS)."""
+    global _llm_cache
+    if _llm_cache is None:
+        with _model_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(
+                    max_entries=int(os.getenv("LLM_CACHE_SIZE", 1000)),
+                    disk_path=os.getenv("LLM_CACHE_PATH") or None,
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 0)),
+                )
+    return _llm_cache
+
+def llm_cache_key(messages, **params) -> str:
+    return LLMResponseCache.key(os.getenv("LLM_MODEL", ""), messages, params)
+
+def forget_llm_response(messages, **params):
+    """Drops a cached answer, e.g. one that turned out to be unusable."""
+    get_llm_cache().discard(llm_cache_key(messages, **params))
+
+async def aforget_llm_response(messages, **params):
+    await get_llm_cache().adiscard(llm_cache_key(messages, **params))
+
+def _replay(text: str):
+    # Cached answers stream back in word-sized deltas, like live ones
+    return re.findall(r"\S+\s*|\s+", text)
+
+def get_chat_model():
+    """
+    Returns the shared chat model, creating the HF endpoint on first use
+    (token automatically picked from env var).
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+                llm = HuggingFaceEndpoint(
+                    repo_id=os.getenv("LLM_MODEL"),
+                    task="text-generation"
+                )
+                _model = ChatHuggingFace(llm=llm)
+    return _model
+
+def call_llm(messages, cache: bool = False, **params):
     """
-    messages: List of ChatMessages (e.g., HumanMessage, SystemMessage).
-    Returns LLM response content as string, or yields tokens if stream=True.
+    messages: List of ChatMessages (e.g., HumanMessage, SystemMessage) or a prompt string.
+    cache: serve/store the answer from the LLM response cache (use for deterministic prompts).
+    params: generation params passed to the model (part of the cache key).
+    Returns LLM response content as string.
     """
-    if not stream:
-        response = model.invoke(messages)
-        return response.content.strip()
-    else:
-        for chunk in model.stream(messages):
-            yield chunk.content 
+    key = llm_cache_key(messages, **params) if cache else None
+    if key and (cached := get_llm_cache().get(key)) is not None:
+        return cached
+    response = get_chat_model().invoke(messages, **params)
+    text = response.content.strip()
+    if key:
+        get_llm_cache().put(key, text)
+    return text
 
+def stream_llm(messages, cache: bool = False, **params):
+    """
+    Streaming variant of call_llm: yields content deltas (str) as the model produces them.
+    With cache=True a cached answer is replayed as deltas; a live answer is stored once complete.
+    """
+    key = llm_cache_key(messages, **params) if cache else None
+    if key and (cached := get_llm_cache().get(key)) is not None:
+        yield from _replay(cached)
+        return
+    parts = []
+    for chunk in get_chat_model().stream(messages, **params):
+        if chunk.content:
+            parts.append(chunk.content)
+            yield chunk.content
+    if key:
+        get_llm_cache().put(key, "".join(parts).strip())
+
+async def acall_llm(messages, cache: bool = False, **params):
+    """
+    Async variant of call_llm: awaits the HF endpoint without blocking the event loop.
+    Returns LLM response content as string.
+    """
+    key = llm_cache_key(messages, **params) if cache else None
+    if key and (cached := await get_llm_cache().aget(key)) is not None:
+        return cached
+    response = await get_chat_model().ainvoke(messages, **params)
+    text = response.content.strip()
+    if key:
+        await get_llm_cache().aput(key, text)
+    return text
+
+async def astream_llm(messages, cache: bool = False, **params):
+    """
+    Async streaming variant: yields content deltas (str) as the model produces them.
+    """
+    key = llm_cache_key(messages, **params) if cache else None
+    if key and (cached := await get_llm_cache().aget(key)) is not None:
+        for delta in _replay(cached):
+            yield delta
+        return
+    parts = []
+    async for chunk in get_chat_model().astream(messages, **params):
+        if chunk.content:
+            parts.append(chunk.content)
+            yield chunk.content
+    if key:
+        await get_llm_cache().aput(key, "".join(parts).strip())
@@ -0,0 +1,38 @@
+import logging
+from langgraph.config import get_stream_writer
+from agent.utils.llm_response import stream_llm, astream_llm
+
+logger = logging.getLogger(__name__)
+
+def emit(event_type: str, content: str):
+    """
+    Sends an event to the graph's "custom" stream (forwarded as SSE by /chat/reasoned/stream).
+    No-op when called outside a graph run or when nobody streams the "custom" mode.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"type": event_type, "content": content})
+
+def emit_thought(thought: str):
+    emit("thought", thought)
+
+def emit_delta(delta: str):
+    emit("delta", delta)
+
+def stream_llm_deltas(messages, cache: bool = False, **params) -> str:
+    """Streams an LLM answer, emitting every token delta. Returns the full answer."""
+    parts = []
+    for delta in stream_llm(messages, cache=cache, **params):
+        emit_delta(delta)
+        parts.append(delta)
+    return "".join(parts).strip()
+
+async def astream_llm_deltas(messages, cache: bool = False, **params) -> str:
+    """Async variant of stream_llm_deltas."""
+    parts = []
+    async for delta in astream_llm(messages, cache=cache, **params):
+        emit_delta(delta)
+        parts.append(delta)
+    return "".join(parts).strip()
@@ -0,0 +1,68 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+# Set on shutdown; releases a warmup still waiting for the first vector snapshot
+_stopping = threading.Event()
+_components: dict[str, str] = {}
+
+def _step(name: str, fn):
+    started = time.perf_counter()
+    _components[name] = "loading"
+    fn()
+    _components[name] = "ready"
+    logger.info(f"[Warmup] {name} ready in {time.perf_counter() - started:.2f}s")
+
+def run_warmup():
+    """
+    Loads models and clients ahead of the first request. Blocking; run it off the event loop.
+    Readiness flips once every component is loaded.
+    """
+    from agent.api.agent_reasoned import get_agent
+    from agent.utils.intent_prototypes import INTENT_PROTO_ENABLED, get_intent_classifier
+    from agent.utils.llm_response import get_chat_model
+    from agent.vector.ado_client import get_ado_client
+    from agent.vector.bm25_index import get_bm25_index
+    from agent.vector.qdrant_client import VECTOR_READ_BACKEND, get_client, get_embedding_cache, get_model, embed
+    from agent.vector.snapshot import wait_for_snapshot
+    from agent.vector.wiki_cache import get_wiki_cache
+
+    try:
+        _step("embedder", get_model)
+        # Snapshot readers never open the embedded store, which the indexer may hold
+        if VECTOR_READ_BACKEND != "snapshot":
+            _step("vector_store", get_client)
+        _step("embedding_cache", get_embedding_cache)
+        _step("bm25_index", get_bm25_index)
+        # First encode pays for torch kernel setup; do it here instead of in a user request
+        _step("embedder_warm", lambda: embed("warmup"))
+        if INTENT_PROTO_ENABLED:
+            _step("intent_prototypes", get_intent_classifier().encode_examples)
+        _step("llm", get_chat_model)
+        _step("graph", get_agent)
+        _step("wiki_cache", lambda: get_wiki_cache(get_ado_client()))
+        if VECTOR_READ_BACKEND == "snapshot":
+            # Last, so everything else is warm: stays "loading" (and /ready 503) until the
+            # indexer publishes the first snapshot
+            _step("vector_store", lambda: wait_for_snapshot(stop=_stopping))
+            if _stopping.is_set():
+                return
+        mark_ready()
+    except Exception as e:
+        logger.exception(f"[Warmup] Failed: {e}")
+        _components["error"] = str(e)
+
+def stop_warmup():
+    _stopping.set()
+
+def mark_ready():
+    _ready.set()
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+def status() -> dict:
+    return {"ready": is_ready(), "components": dict(_components)}
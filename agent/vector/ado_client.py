@@ -1,27 +1,209 @@
 import os
+import time
+import asyncio
+import threading
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
+from agent.vector.wiki_cache import get_wiki_cache
+
+# ADO rejects more than 200 IDs per workitems?ids=... request
+WORK_ITEMS_BATCH_SIZE = 200
+# ADO rejects WIQL queries returning more than 20,000 items (VS402337); larger listings are paged
+WIQL_PAGE_SIZE = int(os.getenv("ADO_WIQL_PAGE_SIZE", 10000))
+RETRY_STATUS_CODES = (429, 503)
 
 class ADOClient:
-    def __init__(self, organization: Optional[str] = None, project: Optional[str] = None, pat: Optional[str] = None):
+    def __init__(
+        self,
+        organization: Optional[str] = None,
+        project: Optional[str] = None,
+        pat: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        pool_size: Optional[int] = None,
+    ):
         self.organization = organization or os.environ.get("ADO_ORGANIZATION")
         self.project = project or os.environ.get("ADO_PROJECT")
         self.pat = pat or os.environ.get("ADO_PAT")
         self.api_base = f"https://dev.azure.com/{self.organization}/{self.project}/_apis"
         self.headers = {"Content-Type": "application/json"}
         self.auth = ("", self.pat)  # PAT as password, blank username
+        self.max_workers = max_workers or int(os.environ.get("ADO_MAX_WORKERS", 4))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("ADO_MAX_RETRIES", 4))
+        self.pool_size = pool_size or int(os.environ.get("ADO_POOL_SIZE", 20))
+        # (connect, read) seconds, for every request
+        self.timeout = (float(os.environ.get("ADO_CONNECT_TIMEOUT", 5)), float(os.environ.get("ADO_READ_TIMEOUT", 30)))
+
+        # Keep-alive connection pools shared by all calls of this client, so TLS handshakes
+        # to dev.azure.com happen once per connection instead of once per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.auth = self.auth
+        self.session.headers.update(self.headers)
+        self._ahttp: Optional[httpx.AsyncClient] = None
+        self._ahttp_loop = None
+
+    def _get_with_retry(self, url: str) -> requests.Response:
+        """
+        GET with exponential backoff on throttling (429) and unavailability (503).
+        Honors the Retry-After header when ADO sends one. Returns the last response.
+        """
+        for attempt in range(self.max_retries + 1):
+            resp = self.session.get(url, timeout=self.timeout)
+            if resp.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return resp
+            retry_after = resp.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+            print(f"[ADOClient] Throttled (code={resp.status_code}), retrying in {delay}s")
+            time.sleep(delay)
+        return resp
+
+    def _async_http(self) -> httpx.AsyncClient:
+        """
+        Pooled async client, shared by all async calls on the running event loop.
+        (An httpx client is bound to the loop it was first used on.)
+        """
+        loop = asyncio.get_running_loop()
+        if self._ahttp is None or self._ahttp_loop is not loop or self._ahttp.is_closed:
+            connect, read = self.timeout
+            self._ahttp = httpx.AsyncClient(
+                auth=self.auth,
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(read, connect=connect),
+            )
+            self._ahttp_loop = loop
+        return self._ahttp
+
+    def close(self):
+        """Closes the pooled sync session (the async client is closed by aclose)."""
+        self.session.close()
+
+    async def aclose(self):
+        self.close()
+        if self._ahttp is not None and not self._ahttp.is_closed:
+            await self._ahttp.aclose()
+
+    async def _aget_with_retry(self, http: httpx.AsyncClient, url: str) -> httpx.Response:
+        """Async variant of _get_with_retry; sleeps without blocking the event loop."""
+        for attempt in range(self.max_retries + 1):
+            resp = await http.get(url)
+            if resp.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return resp
+            retry_after = resp.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+            print(f"[ADOClient] Throttled (code={resp.status_code}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+        return resp
+
+    def _search_attempts(self, query: str) -> List[str]:
+        attempts = [query.strip()]
+        lowered = query.lower()
+        # Try common issue-related keywords if not found
+        for keyword in ["not working", "error", "fails", "issue", "bug", "filter", "button"]:
+            if keyword in lowered and keyword not in attempts:
+                attempts.append(keyword)
+        return attempts
+
+    def _search_wiql(self, attempts: List[str]) -> Dict:
+        """
+        Compiles every search attempt into one WIQL query: a work item matches if any
+        attempt occurs in its title or description.
+        """
+        terms = " OR ".join(
+            "([System.Title] CONTAINS '{0}' OR [System.Description] CONTAINS '{0}')".format(a.replace("'", "''"))
+            for a in attempts
+        )
+        return {
+            "query": f"""
+            SELECT [System.Id]
+            FROM WorkItems
+            WHERE
+                ([System.WorkItemType] = 'User Story' OR [System.WorkItemType] = 'Feature' OR [System.WorkItemType] = 'Bug')
+                AND ({terms})
+            ORDER BY [System.ChangedDate] DESC
+            """
+        }
+
+    @staticmethod
+    def _rank_search_hits(work_items: List[Dict], attempts: List[str]) -> List[Dict]:
+        """
+        Orders the combined query's hits locally: the full query counts 3x a fallback keyword,
+        and a title hit counts 2x a description hit. Ties keep the most recently changed first.
+        """
+        weights = [3] + [1] * (len(attempts) - 1)
+        lowered = [a.lower() for a in attempts]
+
+        def score(wi):
+            fields = wi.get("fields", {})
+            title = (fields.get("System.Title") or "").lower()
+            description = (fields.get("System.Description") or "").lower()
+            return sum(
+                w * (2 if term in title else 1 if term in description else 0)
+                for w, term in zip(weights, lowered)
+            )
+
+        return sorted(work_items, key=score, reverse=True)
+
+    @staticmethod
+    def _search_candidate_ids(wiql_result: Dict) -> List[int]:
+        """
+        Deduplicated candidate IDs, up to one full details batch. The combined query is ordered
+        by ChangedDate, not relevance, so candidates are only cut to top_k after local ranking;
+        a tighter cap here would let recent fallback-keyword hits push out full-query matches.
+        """
+        ids = list(dict.fromkeys(item["id"] for item in wiql_result.get("workItems", [])))
+        return ids[:WORK_ITEMS_BATCH_SIZE]
+
+    @staticmethod
+    def _add_search_hits(results: Dict[str, List[Dict]], work_items: List[Dict]):
+        for wi in work_items:
+            fields = wi.get("fields", {})
+            item = {
+                "id": wi.get("id"),
+                "title": fields.get("System.Title", ""),
+                "description": fields.get("System.Description", ""),
+                "status": fields.get("System.State", ""),
+                "work_item_type": fields.get("System.WorkItemType", ""),
+                "last_modified": fields.get("System.ChangedDate", ""),
+                "source": "work_item"
+            }
+            wtype = item["work_item_type"].lower()
+            if "bug" in wtype:
+                results["bugs"].append(item)
+            elif "story" in wtype:
+                results["stories"].append(item)
+            elif "feature" in wtype:
+                results["features"].append(item)
 
     def search_stories(
         self,
         query: str,
         top_k: int = 10,
-        group_by_type: bool = True
+        group_by_type: bool = True,
+        timeout: Optional[float] = None,
     ) -> Dict[str, List[Dict]]:
         """
         Searches ADO for user stories, features, bugs, and Wiki pages matching the query.
         Returns a dict: keys = 'bugs', 'stories', 'features', 'wikis'.
         Each list: dicts with fields: id, title, description, status, work_item_type, last_modified, source.
+        With `timeout` (seconds), the HTTP calls share that budget, so the calling thread is
+        released close to the deadline instead of after the full read timeout and retries.
         """
+        deadline = time.monotonic() + timeout if timeout else None
+
+        def request_timeout():
+            if deadline is None:
+                return self.timeout
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"search budget of {timeout}s exhausted")
+            return (min(self.timeout[0], remaining), remaining)
+
         results = {
             "bugs": [],
             "stories": [],
@@ -29,123 +211,257 @@ class ADOClient:
             "wikis": []
         }
 
-        # ---- 1. Work Items (Bugs, Stories, Features) ----
-        attempts = [query.strip()]
-        lowered = query.lower()
-        # Try common issue-related keywords if not found
-        for keyword in ["not working", "error", "fails", "issue", "bug", "filter", "button"]:
-            if keyword in lowered and keyword not in attempts:
-                attempts.append(keyword)
+        # ---- 1. Work Items (Bugs, Stories, Features): one WIQL query for all attempts ----
+        attempts = self._search_attempts(query)
+        url = f"{self.api_base}/wit/wiql?$top={WORK_ITEMS_BATCH_SIZE}&api-version=7.1-preview.2"
+        try:
+            resp = self.session.post(url, json=self._search_wiql(attempts), timeout=request_timeout())
+            if resp.status_code != 200:
+                print(f"[ADOClient] WIQL POST failed, code={resp.status_code}, text={resp.text}")
+            else:
+                ids = self._search_candidate_ids(resp.json())
+                # Candidates fit one details batch
+                work_items = self._get_work_items_batch(ids, timeout=request_timeout() if deadline else None) if ids else []
+                self._add_search_hits(results, self._rank_search_hits(work_items, attempts))
+        except Exception as ex:
+            print(f"[ADOClient] WIQL POST failed: {ex}")
 
-        for attempt in attempts:
-            wiql = {
-                "query": f"""
-                SELECT [System.Id], [System.Title], [System.Description], [System.WorkItemType], [System.State], [System.ChangedDate]
-                FROM WorkItems
-                WHERE
-                    ([System.WorkItemType] = 'User Story' OR [System.WorkItemType] = 'Feature' OR [System.WorkItemType] = 'Bug')
-                    AND ([System.Title] CONTAINS '{attempt}' OR [System.Description] CONTAINS '{attempt}')
-                ORDER BY [System.ChangedDate] DESC
-                """
-            }
+        # ---- 2. Wiki Search (local cache, refreshed in the background) ----
+        results["wikis"] = get_wiki_cache(self).search(attempts, limit=top_k)
 
-            url = f"{self.api_base}/wit/wiql?api-version=7.1-preview.2"
-            try:
-                resp = requests.post(url, auth=self.auth, headers=self.headers, json=wiql, timeout=10)
-            except Exception as ex:
-                print(f"[ADOClient] WIQL POST failed: {ex}")
-                continue
+        for key in results:
+            results[key] = results[key][:top_k]
+
+        return results
 
+    async def asearch_stories(
+        self,
+        query: str,
+        top_k: int = 10,
+        group_by_type: bool = True
+    ) -> Dict[str, List[Dict]]:
+        """Async variant of search_stories (non-blocking HTTP via httpx)."""
+        results = {
+            "bugs": [],
+            "stories": [],
+            "features": [],
+            "wikis": []
+        }
+
+        attempts = self._search_attempts(query)
+        url = f"{self.api_base}/wit/wiql?$top={WORK_ITEMS_BATCH_SIZE}&api-version=7.1-preview.2"
+        http = self._async_http()
+        try:
+            resp = await http.post(url, json=self._search_wiql(attempts))
             if resp.status_code != 200:
                 print(f"[ADOClient] WIQL POST failed, code={resp.status_code}, text={resp.text}")
-                continue
-
-            result = resp.json()
-            work_items = result.get("workItems", [])
-            if not work_items:
-                continue
-
-            ids = [str(item["id"]) for item in work_items[:top_k]]
-            if not ids:
-                continue
-
-            details_url = f"{self.api_base}/wit/workitems?ids={','.join(ids)}&$expand=fields&api-version=7.1-preview.3"
-            try:
-                details_resp = requests.get(details_url, auth=self.auth, headers=self.headers, timeout=10)
-            except Exception as ex:
-                print(f"[ADOClient] Details GET failed: {ex}")
-                continue
-
-            if details_resp.status_code != 200:
-                print(f"[ADOClient] Details GET failed, code={details_resp.status_code}, text={details_resp.text}")
-                continue
-
-            for wi in details_resp.json().get("value", []):
-                fields = wi.get("fields", {})
-                item = {
-                    "id": wi.get("id"),
-                    "title": fields.get("System.Title", ""),
-                    "description": fields.get("System.Description", ""),
-                    "status": fields.get("System.State", ""),
-                    "work_item_type": fields.get("System.WorkItemType", ""),
-                    "last_modified": fields.get("System.ChangedDate", ""),
-                    "source": "work_item"
-                }
-                wtype = item["work_item_type"].lower()
-                if "bug" in wtype:
-                    results["bugs"].append(item)
-                elif "story" in wtype:
-                    results["stories"].append(item)
-                elif "feature" in wtype:
-                    results["features"].append(item)
-
-        # ---- 2. Wiki Search ----
-        wikis_url = f"{self.api_base}/wiki/wikis?api-version=7.1-preview.1"
-        try:
-            wikis_resp = requests.get(wikis_url, auth=self.auth, headers=self.headers, timeout=10)
+            else:
+                ids = self._search_candidate_ids(resp.json())
+                self._add_search_hits(results, self._rank_search_hits(await self._aget_work_items(http, ids), attempts))
         except Exception as ex:
-            print(f"[ADOClient] Wikis GET failed: {ex}")
-            wikis_resp = None
+            print(f"[ADOClient] WIQL POST failed: {ex}")
 
-        if wikis_resp and wikis_resp.status_code == 200:
-            for wiki in wikis_resp.json().get("value", []):
-                wiki_id = wiki.get("id")
-                pages_url = f"{self.api_base}/wiki/wikis/{wiki_id}/pages?api-version=7.1-preview.1"
-                try:
-                    pages_resp = requests.get(pages_url, auth=self.auth, headers=self.headers, timeout=10)
-                except Exception as ex:
-                    print(f"[ADOClient] Wiki pages GET failed: {ex}")
-                    continue
-                if pages_resp.status_code != 200:
-                    continue
-                for page in pages_resp.json().get("value", []):
-                    page_id = page.get("id")
-                    title = page.get("path", "").strip("/").split("/")[-1]
-                    content_url = f"{self.api_base}/wiki/wikis/{wiki_id}/pages/{page_id}?includeContent=True&api-version=7.1-preview.1"
-                    try:
-                        content_resp = requests.get(content_url, auth=self.auth, headers=self.headers, timeout=10)
-                    except Exception as ex:
-                        print(f"[ADOClient] Wiki content GET failed: {ex}")
-                        continue
-                    if content_resp.status_code != 200:
-                        continue
-                    content = content_resp.json().get("content", "")
-                    # Only add if keyword matched in title/content
-                    for attempt in attempts:
-                        if (attempt.lower() in title.lower()) or (attempt.lower() in content.lower()):
-                            results["wikis"].append({
-                                "id": f"{wiki_id}:{page_id}",
-                                "title": title,
-                                "description": content[:500],
-                                "source": "wiki"
-                            })
-                            break  # Only once per attempt
+        results["wikis"] = get_wiki_cache(self).search(attempts, limit=top_k)
 
         for key in results:
             results[key] = results[key][:top_k]
 
         return results
 
+    def query_work_item_ids(
+        self, where: str, order_by: str = "[System.ChangedDate] ASC", top: Optional[int] = None
+    ) -> Optional[List[int]]:
+        """
+        Runs a WIQL query with the given WHERE clause and returns the matching work item IDs
+        (at most `top`), or None if the query failed. Uses time precision so ChangedDate
+        comparisons are not rounded to whole days.
+        """
+        wiql = {
+            "query": f"""
+            SELECT [System.Id]
+            FROM WorkItems
+            WHERE {where}
+            ORDER BY {order_by}
+            """
+        }
+        top_param = f"$top={top}&" if top else ""
+        url = f"{self.api_base}/wit/wiql?{top_param}timePrecision=true&api-version=7.1-preview.2"
+        try:
+            resp = self.session.post(url, json=wiql, timeout=self.timeout)
+        except Exception as ex:
+            print(f"[ADOClient] WIQL POST failed: {ex}")
+            return None
+        if resp.status_code != 200:
+            print(f"[ADOClient] WIQL POST failed, code={resp.status_code}, text={resp.text}")
+            return None
+        return [wi["id"] for wi in resp.json().get("workItems", [])]
+
+    def list_work_item_ids(self, where: str, page_size: int = WIQL_PAGE_SIZE) -> Optional[List[int]]:
+        """
+        Returns every work item ID matching the WHERE clause in ascending order, or None if
+        a page failed. Pages by [System.Id] so no single query exceeds the WIQL result limit.
+        """
+        ids = []
+        while True:
+            after = f" AND [System.Id] > {ids[-1]}" if ids else ""
+            page = self.query_work_item_ids(f"({where}){after}", order_by="[System.Id] ASC", top=page_size)
+            if page is None:
+                return None
+            ids.extend(page)
+            if len(page) < page_size:
+                return ids
+
+    def _get_work_items_batch(self, ids: List, timeout=None) -> List[Dict]:
+        # An explicit timeout means a caller deadline: one attempt, no throttling retries
+        details_url = f"{self.api_base}/wit/workitems?ids={','.join(str(i) for i in ids)}&$expand=fields&api-version=7.1-preview.3"
+        try:
+            resp = self.session.get(details_url, timeout=timeout) if timeout else self._get_with_retry(details_url)
+        except Exception as ex:
+            print(f"[ADOClient] Details GET failed: {ex}")
+            return []
+        if resp.status_code != 200:
+            print(f"[ADOClient] Details GET failed, code={resp.status_code}, text={resp.text}")
+            return []
+        return resp.json().get("value", [])
+
+    async def _aget_work_items(self, http: httpx.AsyncClient, ids: List) -> List[Dict]:
+        """Async variant of get_work_items; at most max_workers batches are in flight."""
+        if not ids:
+            return []
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def fetch(batch):
+            details_url = f"{self.api_base}/wit/workitems?ids={','.join(str(i) for i in batch)}&$expand=fields&api-version=7.1-preview.3"
+            async with semaphore:
+                try:
+                    resp = await self._aget_with_retry(http, details_url)
+                except Exception as ex:
+                    print(f"[ADOClient] Details GET failed: {ex}")
+                    return []
+            if resp.status_code != 200:
+                print(f"[ADOClient] Details GET failed, code={resp.status_code}, text={resp.text}")
+                return []
+            return resp.json().get("value", [])
+
+        batches = [ids[i:i + WORK_ITEMS_BATCH_SIZE] for i in range(0, len(ids), WORK_ITEMS_BATCH_SIZE)]
+        results = await asyncio.gather(*(fetch(batch) for batch in batches))
+        return [wi for batch in results for wi in batch]
+
+    def get_work_items(self, ids: List) -> List[Dict]:
+        """
+        Fetches full work items (with fields) for any number of IDs.
+        IDs are split into batches of 200 (the ADO limit) that are fetched concurrently
+        on a bounded worker pool. Returns the raw ADO work item dicts in input order;
+        items of failed batches are missing from the result.
+        """
+        if not ids:
+            return []
+        batches = [ids[i:i + WORK_ITEMS_BATCH_SIZE] for i in range(0, len(ids), WORK_ITEMS_BATCH_SIZE)]
+        if len(batches) == 1:
+            return self._get_work_items_batch(batches[0])
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            results = pool.map(self._get_work_items_batch, batches)
+        return [wi for batch in results for wi in batch]
+
+    def list_wikis(self) -> Optional[List[Dict]]:
+        """Returns all wikis of the project (raw ADO wiki dicts), or None if the listing failed."""
+        url = f"{self.api_base}/wiki/wikis?api-version=7.1-preview.1"
+        try:
+            resp = self.session.get(url, timeout=self.timeout)
+        except Exception as ex:
+            print(f"[ADOClient] Wikis GET failed: {ex}")
+            return None
+        if resp.status_code != 200:
+            print(f"[ADOClient] Wikis GET failed, code={resp.status_code}, text={resp.text}")
+            return None
+        return resp.json().get("value", [])
+
+    def get_wiki_version(self, wiki: Dict) -> Optional[str]:
+        """
+        Returns the latest commit ID of the git repository backing a wiki.
+        Any page edit creates a new commit, so an unchanged commit ID means the wiki is unchanged.
+        """
+        repo_id = wiki.get("repositoryId")
+        if not repo_id:
+            return None
+        url = f"{self.api_base}/git/repositories/{repo_id}/commits?searchCriteria.$top=1&api-version=7.1"
+        versions = wiki.get("versions") or []
+        if versions and versions[0].get("version"):
+            url += f"&searchCriteria.itemVersion.version={versions[0]['version']}"
+        try:
+            resp = self.session.get(url, timeout=self.timeout)
+        except Exception as ex:
+            print(f"[ADOClient] Wiki commits GET failed: {ex}")
+            return None
+        if resp.status_code != 200:
+            print(f"[ADOClient] Wiki commits GET failed, code={resp.status_code}, text={resp.text}")
+            return None
+        commits = resp.json().get("value", [])
+        return commits[0].get("commitId") if commits else None
+
+    def list_wiki_pages(self, wiki_id: str) -> Optional[List[Dict]]:
+        """
+        Lists every page of a wiki in one call (full recursion).
+        Returns a flat list of dicts: id, path; or None if the listing failed.
+        """
+        url = f"{self.api_base}/wiki/wikis/{wiki_id}/pages?recursionLevel=full&api-version=7.1-preview.1"
+        try:
+            resp = self.session.get(url, timeout=self.timeout)
+        except Exception as ex:
+            print(f"[ADOClient] Wiki pages GET failed: {ex}")
+            return None
+        if resp.status_code != 200:
+            print(f"[ADOClient] Wiki pages GET failed, code={resp.status_code}, text={resp.text}")
+            return None
+
+        pages = []
+        stack = [resp.json()]
+        while stack:
+            page = stack.pop()
+            if page.get("id") is not None:
+                pages.append({"id": page["id"], "path": page.get("path", "")})
+            stack.extend(page.get("subPages") or [])
+        return pages
+
+    def get_wiki_page(self, wiki_id: str, page_id, etag: Optional[str] = None) -> Optional[Dict]:
+        """
+        Fetches a wiki page with its content.
+        Returns a dict: id, path, content, etag. If `etag` is given and the page is unchanged,
+        returns a dict with `not_modified=True` and no content. Returns None on failure.
+        """
+        url = f"{self.api_base}/wiki/wikis/{wiki_id}/pages/{page_id}?includeContent=True&api-version=7.1-preview.1"
+        hdrs = {"If-None-Match": etag} if etag else None
+        try:
+            resp = self.session.get(url, headers=hdrs, timeout=self.timeout)
+        except Exception as ex:
+            print(f"[ADOClient] Wiki content GET failed: {ex}")
+            return None
+        if resp.status_code == 304:
+            return {"id": page_id, "etag": etag, "not_modified": True}
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        page_etag = resp.headers.get("ETag")
+        return {
+            "id": page_id,
+            "path": data.get("path", ""),
+            "content": data.get("content", ""),
+            "etag": page_etag,
+            "not_modified": bool(etag and page_etag == etag),
+        }
+
+    @staticmethod
+    def _work_item_patch(fields: Dict[str, str]) -> List[Dict]:
+        return [{"op": "add", "path": f"/fields/{k}", "value": v} for k, v in fields.items()]
+
+    @staticmethod
+    def _created_work_item(data: Dict) -> Dict:
+        return {
+            "id": data.get("id"),
+            "title": data.get("fields", {}).get("System.Title"),
+            "url": data.get("_links", {}).get("html", {}).get("href")
+        }
+
     def create_work_item(
         self,
         work_item_type: str,
@@ -156,33 +472,67 @@ class ADOClient:
         Returns: {id, title, url}
         """
         url = f"{self.api_base}/wit/workitems/${work_item_type}?api-version=7.1-preview.3"
-        patch = []
-        for k, v in fields.items():
-            patch.append({
-                "op": "add",
-                "path": f"/fields/{k}",
-                "value": v
-            })
-        hdrs = {**self.headers, "Content-Type": "application/json-patch+json"}
+        hdrs = {"Content-Type": "application/json-patch+json"}
         try:
-            resp = requests.patch(url, auth=self.auth, headers=hdrs, json=patch, timeout=10)
+            resp = self.session.patch(url, headers=hdrs, json=self._work_item_patch(fields), timeout=self.timeout)
             resp.raise_for_status()
         except Exception as ex:
             print(f"[ADOClient] Work item creation failed: {ex}")
             raise
-        data = resp.json()
-        return {
-            "id": data.get("id"),
-            "title": data.get("fields", {}).get("System.Title"),
-            "url": data.get("_links", {}).get("html", {}).get("href")
-        }
+        return self._created_work_item(resp.json())
+
+    async def acreate_work_item(
+        self,
+        work_item_type: str,
+        fields: Dict[str, str]
+    ) -> Dict:
+        """Async variant of create_work_item. Returns: {id, title, url}"""
+        url = f"{self.api_base}/wit/workitems/${work_item_type}?api-version=7.1-preview.3"
+        hdrs = {"Content-Type": "application/json-patch+json"}
+        try:
+            resp = await self._async_http().patch(url, headers=hdrs, json=self._work_item_patch(fields))
+            resp.raise_for_status()
+        except Exception as ex:
+            print(f"[ADOClient] Work item creation failed: {ex}")
+            raise
+        return self._created_work_item(resp.json())
+
+_clients: Dict[tuple, ADOClient] = {}
+_clients_lock = threading.Lock()
+
+def get_ado_client(
+    organization: Optional[str] = None,
+    project: Optional[str] = None,
+    pat: Optional[str] = None,
+) -> ADOClient:
+    """
+    Process-wide ADOClient per (organization, project, PAT), so nodes, the wiki cache and
+    the indexer reuse one set of pooled keep-alive connections. Defaults come from ADO_* env vars.
+    """
+    key = (
+        organization or os.environ.get("ADO_ORGANIZATION"),
+        project or os.environ.get("ADO_PROJECT"),
+        pat or os.environ.get("ADO_PAT"),
+    )
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = ADOClient(*key)
+    return client
+
+async def close_ado_clients():
+    """Closes the pooled connections of every registered client (app shutdown)."""
+    for client in list(_clients.values()):
+        await client.aclose()
 
 # Example test (remove in prod)
 if __name__ == "__main__":
     ORG = os.environ.get("ADO_ORGANIZATION", "your_org")
     PROJ = os.environ.get("ADO_PROJECT", "your_proj")
     PAT = os.environ.get("ADO_PAT", "your_pat")
-    client = ADOClient(ORG, PROJ, PAT)
+    client = get_ado_client(ORG, PROJ, PAT)
     results = client.search_stories("filter button not working")
     from pprint import pprint
     pprint(results)
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "./bm25_index.json")
+# Characters of document text kept as the payload "description" (LLM context for keyword hits)
+BM25_DESCRIPTION_CHARS = int(os.getenv("BM25_DESCRIPTION_CHARS", 1000))
+# Saved indexes of another format are discarded on load (the indexer then rebuilds in full)
+BM25_FORMAT = 2
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in is it me my not of on or so "
+    "that the this to was we what when where which why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+class BM25Index:
+    """
+    Local inverted index (Okapi BM25) over the same documents and payloads as the Qdrant
+    collection, so keyword matches need neither ADO nor the network.
+    Persisted as JSON (term frequencies + payload per document); postings are rebuilt on load.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._docs: Dict[str, Dict] = {}  # doc_id -> {"tf": {term: n}, "len": int, "payload": dict}
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> {doc_id: tf}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _index(self, doc_id: str, doc: Dict):
+        self._docs[doc_id] = doc
+        self._total_len += doc["len"]
+        for term, tf in doc["tf"].items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id):
+        doc = self._docs.pop(str(doc_id), None)
+        if doc is None:
+            return
+        self._total_len -= doc["len"]
+        for term in doc["tf"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(str(doc_id), None)
+                if not postings:
+                    del self._postings[term]
+
+    def add(self, doc_id, text: str, payload: Dict):
+        """
+        Indexes (or re-indexes) one document. Unless the payload has one, its "description"
+        is the start of the whitespace-normalized text, so keyword hits carry context too.
+        """
+        doc_id = str(doc_id)
+        self.remove(doc_id)
+        if not payload.get("description"):
+            payload = {**payload, "description": " ".join((text or "").split())[:BM25_DESCRIPTION_CHARS]}
+        tokens = tokenize(text)
+        self._index(doc_id, {"tf": dict(Counter(tokens)), "len": len(tokens), "payload": payload})
+
+    def add_documents(self, docs: List[str], metadata_list: List[Dict]):
+        """Same arguments as qdrant_client.add_documents; documents are keyed by metadata 'id'."""
+        for doc, meta in zip(docs, metadata_list):
+            self.add(meta["id"], doc, meta)
+
+    def remove_documents(self, meta_ids: Iterable):
+        for meta_id in meta_ids:
+            self.remove(meta_id)
+
+    @staticmethod
+    def _matches(payload: Dict, filters: Dict) -> bool:
+        for key, value in filters.items():
+            if value is None:
+                continue
+            allowed = value if isinstance(value, (list, tuple, set)) else [value]
+            if payload.get(key) not in allowed:
+                return False
+        return True
+
+    def search(self, text: str, top_k: int = 5, **filters) -> List[Dict]:
+        """
+        Returns the payloads of the top_k best BM25 matches, each with its "bm25" score.
+        Payload filters (e.g. source="work_item", type=["Bug"]) work like in search_similar.
+        """
+        n_docs = len(self._docs)
+        if not n_docs:
+            return []
+        avg_len = self._total_len / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                doc_len = self._docs[doc_id]["len"]
+                norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * doc_len / avg_len))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        results = []
+        for doc_id, score in ranked:
+            payload = self._docs[doc_id]["payload"]
+            if filters and not self._matches(payload, filters):
+                continue
+            results.append({**payload, "bm25": score})
+            if len(results) >= top_k:
+                break
+        return results
+
+    def save(self, path: str = BM25_INDEX_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": BM25_FORMAT, "k1": self.k1, "b": self.b, "docs": self._docs}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = BM25_INDEX_PATH) -> "BM25Index":
+        """Loads a saved index, or returns an empty one if there is none."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != BM25_FORMAT:
+            logger.warning(f"[BM25] {path} has an old format, ignoring it until the indexer rebuilds it")
+            return cls()
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        for doc_id, doc in data.get("docs", {}).items():
+            index._index(doc_id, doc)
+        return index
+
+_index: Optional[BM25Index] = None
+_index_mtime: Optional[float] = None
+_index_lock = threading.Lock()
+
+def get_bm25_index(path: str = BM25_INDEX_PATH) -> BM25Index:
+    """
+    The BM25 index the indexer last published. Reloaded when the file changes, so a
+    running API picks up re-indexes without a restart.
+    """
+    global _index, _index_mtime
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if _index is None or mtime != _index_mtime:
+        with _index_lock:
+            if _index is None or mtime != _index_mtime:
+                try:
+                    _index = BM25Index.load(path)
+                except Exception as e:
+                    logger.error(f"[BM25] Could not load {path}: {e}")
+                    if _index is None:
+                        _index = BM25Index()
+                _index_mtime = mtime
+                logger.info(f"[BM25] Loaded {len(_index)} documents")
+    return _index
@@ -0,0 +1,50 @@
+import os
+from typing import Dict, List, Tuple
+
+# Window and overlap in model tokens. all-MiniLM-L6-v2 truncates its input at 256 word
+# pieces, so anything beyond a window of that size would never reach the embedding.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 200))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 40))
+# Word pieces per whitespace word, on average for English product text; converts token
+# budgets to word counts without running the tokenizer.
+TOKENS_PER_WORD = 1.3
+
+def chunk_text(text: str, window: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Splits text into windows of about `window` tokens, each sharing about `overlap` tokens
+    with the previous one. Short texts come back as a single chunk.
+    """
+    words = (text or "").split()
+    window_words = max(1, int(window / TOKENS_PER_WORD))
+    overlap_words = min(int(overlap / TOKENS_PER_WORD), window_words - 1)
+    if len(words) <= window_words:
+        return [" ".join(words)]
+    step = window_words - overlap_words
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + window_words]))
+        if start + window_words >= len(words):
+            break
+    return chunks
+
+def chunk_documents(docs: List[str], metadata_list: List[Dict]) -> Tuple[List[str], List[Dict]]:
+    """
+    Expands each document into its chunks. Chunk metadata is the parent's metadata (same
+    `id`) plus `parent_id` (the id as a string, for payload filters), `chunk` (index) and
+    `chunk_id` = "<id>#<chunk>"; `description` carries the chunk text so a hit can be used
+    as context as-is.
+    """
+    chunk_docs, chunk_meta = [], []
+    for doc, meta in zip(docs, metadata_list):
+        title = meta.get("title", "")
+        for n, chunk in enumerate(chunk_text(doc)):
+            # Later chunks repeat the title so each one still says what it belongs to
+            chunk_docs.append(chunk if n == 0 or not title else f"{title}\n{chunk}")
+            chunk_meta.append({
+                **meta,
+                "parent_id": str(meta["id"]),
+                "chunk": n,
+                "chunk_id": f"{meta['id']}#{n}",
+                "description": chunk,
+            })
+    return chunk_docs, chunk_meta
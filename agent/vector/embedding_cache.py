@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the disk tier assumes a single process
+    fcntl = None
+
+# Disk tier layout version; files written by an older layout are discarded
+DISK_FORMAT = 2
+
+class EmbeddingCache:
+    """
+    Two-tier cache for sentence embeddings, keyed by model ID + normalized text.
+
+    - Memory tier: bounded LRU of float32 vectors.
+    - Disk tier (optional): a memory-mapped float32 matrix (`<path>.f32`) used as a ring
+      buffer, plus a JSON index (`<path>.index.json`) mapping keys to rows. Survives restarts.
+
+    Several workers may share one disk path. The first to take the `<path>.lock` file lock
+    is the only writer; the others map the files read-only and reload the index when the
+    writer flushes it. Every row also records its key digest (`<path>.keys`), so a row that
+    was overwritten since an index was loaded is treated as a miss, never served.
+
+    Normalization lowercases and collapses whitespace, which is safe for uncased models
+    such as all-MiniLM-L6-v2 (the tokenizer does the same).
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        dim: int,
+        max_entries: int = 10000,
+        disk_path: Optional[str] = None,
+        disk_entries: int = 100000,
+        index_flush_every: int = 100,
+    ):
+        self.model_id = model_id
+        self.dim = dim
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.disk_entries = disk_entries
+        self.index_flush_every = index_flush_every
+
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._matrix = None
+        self._keys = None  # row -> sha1 digest of its key
+        self._writer = False
+        self._lock_file = None
+        self._index_mtime = 0.0
+        self._index_checked = 0.0
+        self._index = {}  # key -> row
+        self._row_keys: List[Optional[str]] = []
+        self._next_row = 0
+        self._unflushed = 0
+        if disk_path:
+            self._open_disk()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split()).lower()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_id}\0{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    # ---- Disk tier ----
+    def _take_writer_lock(self) -> bool:
+        if fcntl is None:
+            return True
+        self._lock_file = open(f"{self.disk_path}.lock", "a+")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+
+    def _read_index(self) -> dict:
+        index_path = f"{self.disk_path}.index.json"
+        try:
+            self._index_mtime = os.path.getmtime(index_path)
+            with open(index_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        matches = (
+            meta.get("format") == DISK_FORMAT and meta.get("model_id") == self.model_id
+            and meta.get("dim") == self.dim and meta.get("capacity") == self.disk_entries
+        )
+        return meta if matches else {}
+
+    def _open_disk(self):
+        matrix_path = f"{self.disk_path}.f32"
+        keys_path = f"{self.disk_path}.keys"
+        os.makedirs(os.path.dirname(os.path.abspath(matrix_path)), exist_ok=True)
+        self._writer = self._take_writer_lock()
+        meta = self._read_index() if os.path.exists(matrix_path) and os.path.exists(keys_path) else {}
+        shape = (self.disk_entries, self.dim)
+        if meta:
+            mode = "r+" if self._writer else "r"
+            self._matrix = np.memmap(matrix_path, dtype=np.float32, mode=mode, shape=shape)
+            self._keys = np.memmap(keys_path, dtype=np.uint8, mode=mode, shape=(self.disk_entries, 20))
+            self._index = meta["index"]
+            self._next_row = meta["next_row"]
+        elif self._writer:
+            # Missing or built for another model/shape/layout: start fresh files
+            self._matrix = np.memmap(matrix_path, dtype=np.float32, mode="w+", shape=shape)
+            self._keys = np.memmap(keys_path, dtype=np.uint8, mode="w+", shape=(self.disk_entries, 20))
+            self._flush_locked()
+        else:
+            # Nothing usable yet, and another process owns the files: memory tier only
+            return
+        self._row_keys = [None] * self.disk_entries
+        for k, row in self._index.items():
+            self._row_keys[row] = k
+
+    def _maybe_reload_index(self):
+        # Readers pick up rows the writer added, at most once per second
+        now = time.monotonic()
+        if self._writer or now - self._index_checked < 1.0:
+            return
+        self._index_checked = now
+        try:
+            if os.path.getmtime(f"{self.disk_path}.index.json") == self._index_mtime:
+                return
+        except OSError:
+            return
+        meta = self._read_index()
+        if meta:
+            self._index = meta["index"]
+
+    def _disk_get(self, key: str) -> Optional[np.ndarray]:
+        row = self._index.get(key)
+        if row is None:
+            return None
+        digest = bytes.fromhex(key)
+        if bytes(self._keys[row]) != digest:
+            # The row was reused for another text after this index was loaded
+            self._index.pop(key, None)
+            return None
+        vector = np.array(self._matrix[row])
+        # Re-check: the writer clears a row's key before overwriting its vector
+        return vector if bytes(self._keys[row]) == digest else None
+
+    def _disk_put(self, key: str, vector: np.ndarray):
+        if not self._writer or key in self._index:
+            return
+        row = self._next_row % self.disk_entries
+        evicted = self._row_keys[row]
+        if evicted is not None:
+            self._index.pop(evicted, None)
+        self._keys[row] = 0
+        self._matrix[row] = vector
+        self._keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+        self._row_keys[row] = key
+        self._index[key] = row
+        self._next_row = row + 1
+        self._unflushed += 1
+        if self._unflushed >= self.index_flush_every:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._matrix is None or not self._writer:
+            return
+        self._matrix.flush()
+        self._keys.flush()
+        index_path = f"{self.disk_path}.index.json"
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": DISK_FORMAT,
+                "model_id": self.model_id,
+                "dim": self.dim,
+                "capacity": self.disk_entries,
+                "next_row": self._next_row,
+                "index": self._index,
+            }, f)
+        os.replace(tmp_path, index_path)
+        self._unflushed = 0
+
+    def flush(self):
+        """Persists the disk tier index (vectors are written through the memory map)."""
+        with self._lock:
+            self._flush_locked()
+
+    # ---- Lookup ----
+    def _put_locked(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+        if self._matrix is not None:
+            self._disk_put(key, vector)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Returns a (len(texts), dim) float32 array. Only cache misses are passed to
+        `encode_fn`, in a single batch.
+        """
+        keys = [self.key(t) for t in texts]
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            if self._matrix is not None:
+                self._maybe_reload_index()
+            for i, k in enumerate(keys):
+                vec = self._lru.get(k)
+                if vec is not None:
+                    self._lru.move_to_end(k)
+                    self.hits += 1
+                elif self._matrix is not None and (vec := self._disk_get(k)) is not None:
+                    self._put_locked(k, vec)
+                    self.disk_hits += 1
+                else:
+                    missing.setdefault(k, []).append(i)
+                    continue
+                vectors[i] = vec
+
+        if missing:
+            miss_keys = list(missing)
+            encoded = np.asarray(encode_fn([texts[missing[k][0]] for k in miss_keys]), dtype=np.float32)
+            with self._lock:
+                self.misses += len(miss_keys)
+                for k, vec in zip(miss_keys, encoded):
+                    self._put_locked(k, vec)
+                    for i in missing[k]:
+                        vectors[i] = vec
+        return np.stack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model_id": self.model_id,
+                "memory_entries": len(self._lru),
+                "memory_capacity": self.max_entries,
+                "disk_entries": len(self._index),
+                "disk_capacity": self.disk_entries if self._matrix is not None else 0,
+                "disk_writer": self._writer,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
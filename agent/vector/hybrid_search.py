@@ -0,0 +1,57 @@
+import os
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from agent.vector.bm25_index import get_bm25_index
+from agent.vector.qdrant_client import search_similar
+
+# Reciprocal rank fusion constant; larger values flatten the advantage of top ranks
+RRF_K = int(os.getenv("HYBRID_RRF_K", 60))
+# Each ranker contributes this many candidates per requested result
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 4))
+# Keyword-only hits (no vector hit above score_threshold) need at least this BM25 score,
+# so a single shared common word does not pull a document into the LLM context
+HYBRID_MIN_BM25 = float(os.getenv("HYBRID_MIN_BM25", 2.0))
+
+# Async searches get their own pool rather than the event loop's shared default executor
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HYBRID_WORKERS", 4)), thread_name_prefix="hybrid")
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = RRF_K) -> List[Dict]:
+    """
+    Fuses ranked result lists by ID: score = sum of 1 / (k + rank) over the lists an item
+    appears in. Items keep every field seen (e.g. both "score" and "bm25") plus "rrf_score".
+    """
+    fused: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            key = str(item.get("id"))
+            entry = fused.setdefault(key, {"rrf_score": 0.0})
+            for field, value in item.items():
+                if entry.get(field) is None:
+                    entry[field] = value
+            entry["rrf_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda item: item["rrf_score"], reverse=True)
+
+def hybrid_search(
+    text: str,
+    top_k: int = 5,
+    score_threshold: Optional[float] = None,
+    **filters,
+) -> List[Dict]:
+    """
+    Semantic (Qdrant) + keyword (local BM25) search fused with reciprocal rank fusion.
+    Vector hits keep their cosine "score"; keyword-only hits have no "score" key and are
+    dropped below HYBRID_MIN_BM25.
+    """
+    candidates = top_k * HYBRID_CANDIDATES
+    semantic = search_similar(text, candidates, score_threshold=score_threshold, **filters)
+    keyword = get_bm25_index().search(text, candidates, **filters)
+    fused = reciprocal_rank_fusion([semantic, keyword])
+    return [item for item in fused if "score" in item or item["bm25"] >= HYBRID_MIN_BM25][:top_k]
+
+async def ahybrid_search(text: str, top_k: int = 5, **kwargs) -> List[Dict]:
+    """Async variant of hybrid_search; embedding and scoring run off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(hybrid_search, text, top_k, **kwargs))
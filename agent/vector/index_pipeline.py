@@ -0,0 +1,174 @@
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from agent.vector.chunking import chunk_documents
+
+logger = logging.getLogger(__name__)
+
+# Documents per batch; a batch is embedded and upserted together, then checkpointed
+INDEX_BATCH_DOCS = int(os.getenv("INDEX_BATCH_DOCS", 64))
+# Batches buffered between two stages; bounds memory regardless of corpus size
+INDEX_QUEUE_SIZE = int(os.getenv("INDEX_QUEUE_SIZE", 4))
+
+_DONE = object()
+
+class StageStats:
+    """Items processed and time spent working (not waiting on queues) by one stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def add(self, items: int, started: float):
+        self.items += items
+        self.seconds += time.perf_counter() - started
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "seconds": round(self.seconds, 2),
+            "per_second": round(self.items / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+class IndexPipeline:
+    """
+    Streams items into the vector store: fetch -> clean -> chunk -> embed -> upsert.
+    Three worker threads (fetch; clean + unchanged-filter + chunk; embed) and the calling
+    thread (upsert) hand batches on through bounded queues, so fetching, embedding and
+    upserting overlap and memory stays flat.
+
+    - `clean(item)` turns a fetched item into (doc text, payload metadata).
+    - Unchanged documents are dropped before chunking (`filter_unchanged`).
+    - `encode` and `upsert` default to the Qdrant collection's encode_chunks/upsert_chunks.
+    - `on_batch(items, docs, meta)` runs after each batch is upserted, in input order;
+      use it to checkpoint progress. Items of a batch that failed are never reported.
+    """
+
+    def __init__(
+        self,
+        clean: Callable[[Dict], Tuple[str, Dict]],
+        batch_docs: int = INDEX_BATCH_DOCS,
+        queue_size: int = INDEX_QUEUE_SIZE,
+        encode: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        filter_unchanged: Optional[Callable[[List[str], List[Dict]], Tuple[List[str], List[Dict]]]] = None,
+        upsert: Optional[Callable[[List[Dict], List[List[float]]], None]] = None,
+    ):
+        if encode is None or filter_unchanged is None or upsert is None:
+            from agent.vector import qdrant_client
+            encode = encode or qdrant_client.encode_chunks
+            filter_unchanged = filter_unchanged or qdrant_client.filter_unchanged
+            upsert = upsert or qdrant_client.upsert_chunks
+        self.clean = clean
+        self.batch_docs = batch_docs
+        self.queue_size = queue_size
+        self.encode = encode
+        self.filter_unchanged = filter_unchanged
+        self.upsert = upsert
+
+    def run(self, items: Iterable[Dict], on_batch: Optional[Callable[[List[Dict], List[str], List[Dict]], None]] = None) -> Dict[str, dict]:
+        """Processes every item and returns per-stage throughput. Re-raises the first stage error."""
+        stats = {name: StageStats(name) for name in ("fetch", "clean", "chunk", "embed", "upsert")}
+        fetched = queue.Queue(maxsize=self.batch_docs * self.queue_size)
+        chunked = queue.Queue(maxsize=self.queue_size)
+        embedded = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+
+        def put(q, value):
+            while not stop.is_set():
+                try:
+                    q.put(value, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def stage(fn):
+            def runner():
+                try:
+                    fn()
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+            return threading.Thread(target=runner, name=f"index-{fn.__name__}", daemon=True)
+
+        def fetch():
+            source = iter(items)
+            while not stop.is_set():
+                started = time.perf_counter()
+                item = next(source, _DONE)
+                if item is _DONE:
+                    break
+                stats["fetch"].add(1, started)
+                if not put(fetched, item):
+                    return
+            put(fetched, _DONE)
+
+        def prepare():
+            batch, done = [], False
+            while not done:
+                item = get(fetched)
+                done = item is _DONE
+                if not done:
+                    batch.append(item)
+                if not batch or (len(batch) < self.batch_docs and not done):
+                    continue
+                started = time.perf_counter()
+                docs, meta = map(list, zip(*(self.clean(i) for i in batch)))
+                stats["clean"].add(len(batch), started)
+                started = time.perf_counter()
+                changed_docs, changed_meta = self.filter_unchanged(docs, meta)
+                chunk_docs, chunk_meta = chunk_documents(changed_docs, changed_meta)
+                stats["chunk"].add(len(chunk_docs), started)
+                if not put(chunked, (batch, docs, meta, chunk_docs, chunk_meta)):
+                    return
+                batch = []
+            put(chunked, _DONE)
+
+        def embed():
+            while True:
+                work = get(chunked)
+                if work is _DONE:
+                    break
+                batch, docs, meta, chunk_docs, chunk_meta = work
+                started = time.perf_counter()
+                vectors = self.encode(chunk_docs) if chunk_docs else []
+                stats["embed"].add(len(chunk_docs), started)
+                if not put(embedded, (batch, docs, meta, chunk_meta, vectors)):
+                    return
+            put(embedded, _DONE)
+
+        threads = [stage(fetch), stage(prepare), stage(embed)]
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                work = get(embedded)
+                if work is _DONE:
+                    break
+                batch, docs, meta, chunk_meta, vectors = work
+                started = time.perf_counter()
+                self.upsert(chunk_meta, vectors)
+                stats["upsert"].add(len(chunk_meta), started)
+                if on_batch:
+                    on_batch(batch, docs, meta)
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+        if errors:
+            raise errors[0]
+        return {name: s.as_dict() for name, s in stats.items()}
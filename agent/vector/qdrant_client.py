@@ -1,27 +1,147 @@
 import os
+import asyncio
 import hashlib
+import logging
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+from qdrant_client.models import (
+    Distance, VectorParams, VectorParamsDiff, PointStruct, PointIdsList, FilterSelector, Filter, FieldCondition,
+    MatchValue, MatchAny, ScalarQuantization, ScalarQuantizationConfig, ScalarType, PayloadSchemaType,
+    SearchParams, QuantizationSearchParams, Disabled,
+)
+from agent.vector.chunking import CHUNK_OVERLAP, CHUNK_TOKENS, chunk_documents
+from agent.vector.embedding_cache import EmbeddingCache
+from agent.vector.snapshot import export_snapshot, get_snapshot
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "agent-knowledge")
 
 #  Embedder setup
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+EMBED_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_DIM = 384
+
+# Chunk hits fetched per requested document, before aggregating them by parent
+CHUNK_SEARCH_FACTOR = int(os.getenv("CHUNK_SEARCH_FACTOR", 3))
+
+#  Collection storage: full-precision vectors on disk, int8 copies in RAM for scoring, and the
+#  top candidates rescored against the originals. Set QDRANT_QUANTIZATION=false to disable.
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "true").lower() == "true"
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "true").lower() == "true"
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", 2.0))
+#  Payload fields searches filter on (and parent_id, used to replace a document's chunks)
+PAYLOAD_INDEX_FIELDS = ("source", "type", "work_item_type", "status", "parent_id")
+
+# "qdrant" searches the collection directly; "snapshot" searches the memory-mapped snapshot
+# the indexer publishes (agent/vector/snapshot.py), so API workers never open the store
+VECTOR_READ_BACKEND = os.getenv("VECTOR_READ_BACKEND", "qdrant").lower()
+
+#  Model, store and cache are created on first use (or by the startup warmup), so importing
+#  this module stays cheap. Double-checked locking keeps the singletons thread-safe.
+_model = None
+_client = None
+_embedding_cache = None
+_init_lock = threading.Lock()
+
+def get_model():
+    global _model
+    if _model is None:
+        with _init_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBED_MODEL_ID)
+    return _model
+
+def get_client() -> QdrantClient:
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                #  Qdrant server if QDRANT_URL is set, embedded mode otherwise
+                _client = QdrantClient(url=QDRANT_URL) if QDRANT_URL else QdrantClient(path="./qdrant_db")
+    return _client
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Query embedding cache (memory LRU + optional memory-mapped disk tier)."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _init_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    EMBED_MODEL_ID,
+                    EMBED_DIM,
+                    max_entries=int(os.getenv("EMBED_CACHE_SIZE", 10000)),
+                    disk_path=os.getenv("EMBED_CACHE_PATH") or None,
+                    disk_entries=int(os.getenv("EMBED_CACHE_DISK_SIZE", 100000)),
+                )
+    return _embedding_cache
+
+def flush_embedding_cache():
+    """Persists the embedding cache's disk index, if the cache was ever created."""
+    if _embedding_cache is not None:
+        _embedding_cache.flush()
+
+def embed(text: str) -> list[float]:
+    """Embeds one query text, served from the embedding cache when possible."""
+    return get_embedding_cache().encode([text], get_model().encode)[0].tolist()
 
-#  Qdrant (embedded mode; for prod server, use url=...)
-client = QdrantClient(path="./qdrant_db")
+#  Embedding is CPU-bound; async callers run it here instead of on the event loop
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("EMBED_WORKERS", 2)), thread_name_prefix="embed")
 
-# Create collection (if not exists)
+async def aembed(text: str) -> list[float]:
+    """Async variant of embed: encodes on the embedding executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, embed, text)
+
+def _quantization_config():
+    if not QDRANT_QUANTIZATION:
+        return None
+    return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+
+_search_params = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=QDRANT_OVERSAMPLING)
+) if QDRANT_QUANTIZATION else None
+
+# Create collection (if not exists), or bring an existing one up to the configured schema in place.
+# Embedded mode accepts but ignores quantization and payload indexes, so only a server collection
+# is migrated.
 def init_qdrant():
+    client = get_client()
     if COLLECTION_NAME not in [c.name for c in client.get_collections().collections]:
-        client.recreate_collection(
+        client.create_collection(
+            collection_name=COLLECTION_NAME,
+            vectors_config=VectorParams(size=EMBED_DIM, distance=Distance.COSINE, on_disk=QDRANT_ON_DISK),
+            quantization_config=_quantization_config(),
+        )
+    if not QDRANT_URL:
+        return
+    info = client.get_collection(COLLECTION_NAME)
+    vectors = info.config.params.vectors
+    quantized = info.config.quantization_config is not None
+    on_disk_changed = bool(getattr(vectors, "on_disk", False)) != QDRANT_ON_DISK
+    if on_disk_changed or quantized != QDRANT_QUANTIZATION:
+        print(f"Migrating collection {COLLECTION_NAME}: on_disk={QDRANT_ON_DISK}, quantization={QDRANT_QUANTIZATION}")
+        if quantized == QDRANT_QUANTIZATION:
+            quantization = None  # unchanged
+        else:
+            quantization = _quantization_config() if QDRANT_QUANTIZATION else Disabled.DISABLED
+        client.update_collection(
             collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=384, distance=Distance.COSINE),
+            vectors_config={"": VectorParamsDiff(on_disk=QDRANT_ON_DISK)} if on_disk_changed else None,
+            quantization_config=quantization,
         )
+    indexed = set(info.payload_schema or {})
+    for field in PAYLOAD_INDEX_FIELDS:
+        if field not in indexed:
+            client.create_payload_index(
+                collection_name=COLLECTION_NAME, field_name=field, field_schema=PayloadSchemaType.KEYWORD,
+            )
 
 #  Safely create Qdrant int ID from any metadata id (int or str)
 def _make_int_id(meta_id, fallback_int):
@@ -37,25 +157,195 @@ def _make_int_id(meta_id, fallback_int):
         return int(h[:8], 16)
     # fallback_int only used if meta_id missing
 
-#  Add documents (no overwrites, no UUID errors)
-def add_documents(docs: list[str], metadata_list: list[dict]):
-    vectors = model.encode(docs).tolist()
+#  Point ID of a chunk: 60 bits of its md5, so chunk IDs do not collide at corpus scale
+def _chunk_point_id(chunk_id: str) -> int:
+    return int(hashlib.md5(chunk_id.encode()).hexdigest()[:15], 16)
+
+#  Remove every point of the given documents: their chunks, and the single whole-document
+#  point that was stored before chunking (same id mapping as before)
+def _delete_parents(meta_ids: list):
+    client = get_client()
+    client.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=FilterSelector(filter=_payload_filter(parent_id=[str(m) for m in meta_ids])),
+    )
+    client.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=PointIdsList(points=[_make_int_id(m, i) for i, m in enumerate(meta_ids)]),
+    )
+
+#  Fingerprint of what a document's points were built from: its text, the chunking settings
+#  and the embedding model. Stored on every chunk so unchanged documents can be skipped.
+def _content_hash(doc: str) -> str:
+    return hashlib.sha1(f"{EMBED_MODEL_ID}\0{CHUNK_TOKENS}:{CHUNK_OVERLAP}\0{doc}".encode("utf-8")).hexdigest()
+
+#  Stored first-chunk payload per document id, fetched in one request by deterministic point id
+def _stored_payloads(meta_ids: list) -> dict:
+    points = get_client().retrieve(
+        collection_name=COLLECTION_NAME,
+        ids=[_chunk_point_id(f"{m}#0") for m in meta_ids],
+        with_payload=True,
+        with_vectors=False,
+    )
+    return {p.payload.get("parent_id"): p.payload for p in points}
+
+#  Drop documents whose content hash is already stored, so they are not re-embedded; if only
+#  their metadata (e.g. status) changed, the payload of their chunks is updated in place.
+#  Returns the remaining docs and their metadata, stamped with content_hash and embed_model.
+def filter_unchanged(docs: list[str], metadata_list: list[dict]) -> tuple[list[str], list[dict]]:
+    if not docs:
+        return [], []
+    client = get_client()
+    stored = _stored_payloads([m["id"] for m in metadata_list])
+    changed_docs, changed_meta = [], []
+    for doc, meta in zip(docs, metadata_list):
+        content_hash = _content_hash(doc)
+        old = stored.get(str(meta["id"]))
+        if old is None or old.get("content_hash") != content_hash:
+            changed_docs.append(doc)
+            changed_meta.append({**meta, "content_hash": content_hash, "embed_model": EMBED_MODEL_ID})
+            continue
+        updates = {k: v for k, v in meta.items() if old.get(k) != v}
+        if updates:
+            client.set_payload(
+                collection_name=COLLECTION_NAME,
+                payload=updates,
+                points=FilterSelector(filter=_payload_filter(parent_id=str(meta["id"]))),
+            )
+    return changed_docs, changed_meta
+
+#  Bulk (indexing) embedding: batch size per forward pass, and optionally a pool of worker
+#  processes so full re-indexes use every core. The pool is started explicitly by the indexer.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+_embed_pool = None
+# Separate from _init_lock, which get_model takes while loading the model
+_embed_pool_lock = threading.Lock()
+
+def start_embed_pool(processes: int):
+    """Starts `processes` embedding worker processes (CPU); encode_chunks uses them until stopped."""
+    global _embed_pool
+    if _embed_pool is None and processes > 1:
+        model = get_model()
+        with _embed_pool_lock:
+            if _embed_pool is None:
+                # Workers are fresh processes: give each its share of the cores instead of
+                # letting every torch runtime claim all of them
+                os.environ.setdefault("OMP_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // processes)))
+                _embed_pool = model.start_multi_process_pool(target_devices=["cpu"] * processes)
+    return _embed_pool
+
+def stop_embed_pool():
+    global _embed_pool
+    with _embed_pool_lock:
+        pool, _embed_pool = _embed_pool, None
+    if pool is not None:
+        get_model().stop_multi_process_pool(pool)
+
+#  Embed chunk texts for indexing, across the worker pool if one is running
+def encode_chunks(chunk_docs: list[str], batch_size: int | None = None) -> list[list[float]]:
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    pool = _embed_pool
+    if pool is not None and len(chunk_docs) > batch_size:
+        # Split the input evenly so every worker gets a share of each pipeline batch
+        workers = len(pool["processes"])
+        chunk_size = max(batch_size, -(-len(chunk_docs) // workers))
+        return get_model().encode_multi_process(chunk_docs, pool, batch_size=batch_size, chunk_size=chunk_size).tolist()
+    return get_model().encode(chunk_docs, batch_size=batch_size).tolist()
+
+#  Replace all points of the chunks' parent documents with the given chunks
+def upsert_chunks(chunk_meta: list[dict], vectors: list[list[float]]):
+    if not chunk_meta:
+        return
     points = [
-        PointStruct(
-            id=_make_int_id(metadata_list[i].get('id', i), i),
-            vector=vectors[i],
-            payload=metadata_list[i]
-        )
-        for i in range(len(docs))
+        PointStruct(id=_chunk_point_id(meta["chunk_id"]), vector=vector, payload=meta)
+        for vector, meta in zip(vectors, chunk_meta)
     ]
-    client.upsert(collection_name=COLLECTION_NAME, points=points)
+    _delete_parents(list(dict.fromkeys(m["id"] for m in chunk_meta)))
+    get_client().upsert(collection_name=COLLECTION_NAME, points=points)
+
+#  Add documents: each one is split into overlapping chunks, one point per chunk.
+#  Existing chunks of the same documents are replaced (a shorter text leaves no stale chunks),
+#  unchanged documents are skipped (see filter_unchanged).
+#  Returns the number of documents that were embedded.
+def add_documents(docs: list[str], metadata_list: list[dict]) -> int:
+    changed_docs, changed_meta = filter_unchanged(docs, metadata_list)
+    if not changed_docs:
+        return 0
+    chunk_docs, chunk_meta = chunk_documents(changed_docs, changed_meta)
+    upsert_chunks(chunk_meta, encode_chunks(chunk_docs))
+    return len(changed_docs)
+
+#  Delete documents (all their chunks) by their metadata ids
+def delete_documents(meta_ids: list):
+    if not meta_ids:
+        return
+    _delete_parents(meta_ids)
+
+#  Build a payload filter; each value may be a single value or a list (match any)
+def _payload_filter(**conditions):
+    must = []
+    for key, value in conditions.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            must.append(FieldCondition(key=key, match=MatchAny(any=list(value))))
+        else:
+            must.append(FieldCondition(key=key, match=MatchValue(value=value)))
+    return Filter(must=must) if must else None
 
 #  Query similar documents (semantic search)
-def search_similar(text: str, top_k: int = 3):
-    query_vector = model.encode(text).tolist()
-    hits = client.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=top_k,
-    )
-    return [hit.payload for hit in hits]
+def search_similar(
+    text: str,
+    top_k: int = 3,
+    score_threshold: float | None = None,
+    source=None,
+    type=None,
+    status=None,
+):
+    """
+    Returns the top_k most similar documents, each as the payload of its best-matching chunk
+    with that chunk's cosine "score" (chunk hits are aggregated by parent document).
+    score_threshold and the payload filters (source, type, status) are applied by Qdrant, or by
+    the published snapshot when VECTOR_READ_BACKEND=snapshot (no results until one exists).
+    """
+    query_vector = embed(text)
+    limit = top_k * CHUNK_SEARCH_FACTOR
+    if VECTOR_READ_BACKEND == "snapshot":
+        # Never fall back to Qdrant here: opening the embedded store would take the lock the
+        # indexer holds. Until a snapshot is published, /ready reports 503 and searches are empty.
+        snapshot = get_snapshot()
+        if snapshot is None:
+            logger.warning("[VectorSearch] No vector snapshot published yet, returning no results")
+            return []
+        hits = snapshot.search(query_vector, limit, score_threshold, source=source, type=type, status=status)
+    else:
+        hits = [
+            (hit.payload, hit.score)
+            for hit in get_client().query_points(
+                collection_name=COLLECTION_NAME,
+                query=query_vector,
+                query_filter=_payload_filter(source=source, type=type, status=status),
+                score_threshold=score_threshold,
+                search_params=_search_params,
+                limit=limit,
+            ).points
+        ]
+    results, seen = [], set()
+    for payload, score in hits:  # best score first
+        parent = payload.get("parent_id", str(payload.get("id")))
+        if parent in seen:
+            continue
+        seen.add(parent)
+        results.append({**payload, "score": score})
+        if len(results) >= top_k:
+            break
+    return results
+
+#  Async variant: runs encode + search on the embedding executor
+async def asearch_similar(text: str, top_k: int = 3, **filters):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(search_similar, text, top_k, **filters))
+
+#  Publish a read-only snapshot of the collection for VECTOR_READ_BACKEND=snapshot readers
+def export_vector_snapshot() -> str:
+    return export_snapshot(get_client(), COLLECTION_NAME, EMBED_DIM)
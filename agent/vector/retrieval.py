@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+from agent.vector.hybrid_search import hybrid_search, ahybrid_search
+
+logger = logging.getLogger(__name__)
+
+# Per-source deadlines (seconds); a source that misses its deadline contributes nothing
+RETRIEVAL_VECTOR_TIMEOUT = float(os.getenv("RETRIEVAL_VECTOR_TIMEOUT", 3))
+RETRIEVAL_ADO_TIMEOUT = float(os.getenv("RETRIEVAL_ADO_TIMEOUT", 8))
+
+# Confidence predicate: (source, items) -> True if the items already answer the question
+Confident = Callable[[str, List[Dict]], bool]
+
+# One pool per source: a straggling ADO call (a running future cannot be cancelled) never
+# takes a worker away from vector searches. ADO calls are also given their deadline as an
+# HTTP budget, so they free their worker shortly after it.
+_vector_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_WORKERS", 4)), thread_name_prefix="retrieval")
+_ado_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_ADO_WORKERS", 8)), thread_name_prefix="retrieval-ado")
+
+def _ado_items(ado_results) -> List[Dict]:
+    if not isinstance(ado_results, dict):
+        return []
+    items = []
+    for k in ["stories", "bugs", "features", "wikis"]:
+        items.extend(ado_results.get(k, []))
+    return items
+
+def _result(semantic, ado_results) -> Dict:
+    """{"semantic": [...], "ado": grouped ADO results or None, "merged": deduplicated by ID}"""
+    merged, seen = [], set()
+    for item in (semantic or []) + _ado_items(ado_results):
+        key = str(item.get("id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(item)
+    return {"semantic": semantic or [], "ado": ado_results, "merged": merged}
+
+def retrieve(
+    query: str,
+    top_k: int = 5,
+    score_threshold: Optional[float] = None,
+    ado_client=None,
+    confident: Optional[Confident] = None,
+) -> Dict:
+    """
+    Runs the local hybrid search (Qdrant + BM25, fused) and, if `ado_client` is given, the
+    ADO keyword search concurrently, each bounded by its deadline. As soon as one source
+    returns items that `confident` accepts, the other is no longer waited for.
+    """
+    started = time.monotonic()
+    futures = {_vector_executor.submit(hybrid_search, query, top_k, score_threshold=score_threshold): "vector"}
+    if ado_client is not None:
+        futures[_ado_executor.submit(ado_client.search_stories, query, top_k=top_k, timeout=RETRIEVAL_ADO_TIMEOUT)] = "ado"
+    deadlines = {"vector": RETRIEVAL_VECTOR_TIMEOUT, "ado": RETRIEVAL_ADO_TIMEOUT}
+    found = {"vector": None, "ado": None}
+
+    pending = set(futures)
+    while pending:
+        elapsed = time.monotonic() - started
+        timeout = min(deadlines[futures[f]] for f in pending) - elapsed
+        done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        for f in done:
+            source = futures[f]
+            try:
+                found[source] = f.result()
+            except Exception as e:
+                logger.error(f"[Retrieval] {source} search failed: {e}")
+                continue
+            items = found[source] if source == "vector" else _ado_items(found[source])
+            if confident and confident(source, items):
+                logger.debug(f"[Retrieval] Confident {source} match, not waiting for {[futures[p] for p in pending]}")
+                for p in pending:
+                    p.cancel()
+                pending = set()
+        elapsed = time.monotonic() - started
+        for f in [f for f in pending if elapsed >= deadlines[futures[f]]]:
+            logger.warning(f"[Retrieval] {futures[f]} search missed its {deadlines[futures[f]]}s deadline")
+            f.cancel()
+            pending.discard(f)
+    return _result(found["vector"], found["ado"])
+
+async def aretrieve(
+    query: str,
+    top_k: int = 5,
+    score_threshold: Optional[float] = None,
+    ado_client=None,
+    confident: Optional[Confident] = None,
+) -> Dict:
+    """Async variant of retrieve: sources run as tasks and the slow one is cancelled."""
+    tasks = {
+        asyncio.create_task(asyncio.wait_for(
+            ahybrid_search(query, top_k, score_threshold=score_threshold), RETRIEVAL_VECTOR_TIMEOUT
+        )): "vector"
+    }
+    if ado_client is not None:
+        tasks[asyncio.create_task(asyncio.wait_for(
+            ado_client.asearch_stories(query, top_k=top_k), RETRIEVAL_ADO_TIMEOUT
+        ))] = "ado"
+    found = {"vector": None, "ado": None}
+
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            source = tasks[t]
+            try:
+                found[source] = t.result()
+            except asyncio.TimeoutError:
+                logger.warning(f"[Retrieval] {source} search missed its deadline")
+                continue
+            except Exception as e:
+                logger.error(f"[Retrieval] {source} search failed: {e}")
+                continue
+            items = found[source] if source == "vector" else _ado_items(found[source])
+            if confident and confident(source, items):
+                logger.debug(f"[Retrieval] Confident {source} match, cancelling {[tasks[p] for p in pending]}")
+                for p in pending:
+                    p.cancel()
+                pending = set()
+    return _result(found["vector"], found["ado"])
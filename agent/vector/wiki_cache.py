@@ -0,0 +1,214 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every process refreshes on its own
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WIKI_CACHE_PATH = os.getenv("WIKI_CACHE_PATH", "./wiki_cache.json")
+WIKI_CACHE_REFRESH_SECONDS = int(os.getenv("WIKI_CACHE_REFRESH_SECONDS", 600))
+# How often worker processes that do not hold the writer lock reload the cache file
+WIKI_CACHE_RELOAD_SECONDS = int(os.getenv("WIKI_CACHE_RELOAD_SECONDS", 30))
+
+class WikiCache:
+    """
+    Local copy of all ADO wiki pages, so product questions never crawl the wiki per request.
+    Refreshes run in a background thread: a wiki is only re-listed when the commit of its
+    backing repo moved, and a page is only re-downloaded when its ETag changed.
+    The cache is persisted to disk and reloaded on startup. With several worker processes,
+    the one holding an flock on `<path>.lock` crawls ADO and writes the file; the others
+    reload it whenever it changes.
+    """
+
+    def __init__(self, ado_client, path: str = WIKI_CACHE_PATH, refresh_seconds: int = WIKI_CACHE_REFRESH_SECONDS):
+        self.ado = ado_client
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        # wiki_id -> {"version": str, "pages": {page_id: {"title", "content", "etag"}}}
+        self._wikis: Dict[str, Dict] = {}
+        # Lowercased searchable text per "wiki_id:page_id", rebuilt on load/refresh
+        self._search_text: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        self._mtime: Optional[float] = None
+        self._load()
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                wikis = json.load(f)
+        except Exception as ex:
+            logger.warning(f"[WikiCache] Could not load {self.path}: {ex}")
+            wikis = {}
+        search_text = self._build_search_text(wikis)
+        with self._lock:
+            self._wikis, self._search_text = wikis, search_text
+        self._mtime = mtime
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def _take_writer_lock(self) -> bool:
+        """True if this process is (or just became) the single writer of the cache file."""
+        if fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(f"{self.path}.lock", "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        # Another process may have written the file since this one loaded it
+        self._reload_if_changed()
+        return True
+
+    def _save(self):
+        # Per-process tmp name, so two writers (e.g. without fcntl) never write into the same file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._wikis, f)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    @staticmethod
+    def _build_search_text(wikis: Dict[str, Dict]) -> Dict[str, str]:
+        return {
+            f"{wiki_id}:{page_id}": f"{page['title']}\n{page['content']}".lower()
+            for wiki_id, wiki in wikis.items()
+            for page_id, page in wiki.get("pages", {}).items()
+        }
+
+    def refresh(self):
+        """Brings the cache up to date with ADO. Safe to call while searches are running."""
+        wikis = self.ado.list_wikis()
+        if wikis is None:
+            return
+        updated = {}
+        changed = False
+        for wiki in wikis:
+            wiki_id = wiki.get("id")
+            cached = self._wikis.get(wiki_id, {})
+            version = self.ado.get_wiki_version(wiki)
+            if version and version == cached.get("version"):
+                updated[wiki_id] = cached
+                continue
+
+            listing = self.ado.list_wiki_pages(wiki_id)
+            if listing is None:
+                updated[wiki_id] = cached
+                continue
+            old_pages = cached.get("pages", {})
+            pages = {}
+            complete = True
+            for page in listing:
+                page_id = str(page["id"])
+                old = old_pages.get(page_id)
+                fetched = self.ado.get_wiki_page(wiki_id, page_id, etag=old["etag"] if old else None)
+                if fetched is None:
+                    complete = False
+                    if old:
+                        pages[page_id] = old
+                    continue
+                if fetched["not_modified"]:
+                    pages[page_id] = old
+                    continue
+                path = fetched.get("path") or page.get("path", "")
+                pages[page_id] = {
+                    "title": path.strip("/").split("/")[-1] or f"Page {page_id}",
+                    "content": fetched.get("content", ""),
+                    "etag": fetched.get("etag"),
+                }
+            # Only record the version once every page is in, so failed pages are retried
+            updated[wiki_id] = {"version": version if complete else None, "pages": pages}
+            changed = True
+
+        if changed or set(updated) != set(self._wikis):
+            search_text = self._build_search_text(updated)
+            with self._lock:
+                self._wikis, self._search_text = updated, search_text
+            self._save()
+            logger.info(f"[WikiCache] Refreshed: {sum(len(w['pages']) for w in updated.values())} pages")
+
+    def search(self, terms: List[str], limit: int = 10) -> List[Dict]:
+        """
+        Local substring search over page titles and contents. A page matches if any term
+        occurs in it. Returns dicts: id, title, description (content excerpt), source.
+        """
+        lowered = [t.lower() for t in terms if t]
+        results = []
+        with self._lock:
+            wikis, search_text = self._wikis, self._search_text
+        for key, text in search_text.items():
+            if any(t in text for t in lowered):
+                wiki_id, page_id = key.split(":", 1)
+                page = wikis[wiki_id]["pages"][page_id]
+                results.append({
+                    "id": key,
+                    "title": page["title"],
+                    "description": page["content"][:500],
+                    "source": "wiki"
+                })
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _run(self):
+        while not self._stop.is_set():
+            writer = False
+            try:
+                writer = self._take_writer_lock()
+                if writer:
+                    self.refresh()
+                else:
+                    self._reload_if_changed()
+            except Exception as ex:
+                logger.error(f"[WikiCache] Refresh failed: {ex}")
+            # Readers check the file more often, so they pick up the writer's refresh quickly
+            self._stop.wait(self.refresh_seconds if writer else min(self.refresh_seconds, WIKI_CACHE_RELOAD_SECONDS))
+
+    def start_background_refresh(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wiki-cache-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+_wiki_cache: Optional[WikiCache] = None
+_wiki_cache_lock = threading.Lock()
+
+def get_wiki_cache(ado_client) -> WikiCache:
+    """Returns the process-wide wiki cache, starting its background refresh on first use."""
+    global _wiki_cache
+    if _wiki_cache is None:
+        with _wiki_cache_lock:
+            if _wiki_cache is None:
+                cache = WikiCache(ado_client)
+                cache.start_background_refresh()
+                _wiki_cache = cache
+    return _wiki_cache
+
+def stop_wiki_cache():
+    """Stops the background refresh, if the cache was ever started."""
+    if _wiki_cache is not None:
+        _wiki_cache.stop_background_refresh()
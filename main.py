@@ -1,24 +1,40 @@
 import os
+import asyncio
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+from agent.utils.warmup import run_warmup, mark_ready, stop_warmup
+from agent.vector.qdrant_client import flush_embedding_cache
+from agent.vector.wiki_cache import stop_wiki_cache
+from agent.vector.ado_client import close_ado_clients
 
 # Import routers
 from agent.api.memory import router as memory_router
 from agent.api.debug import router as debug_router
 from agent.api.agent_reasoned import router as reasoned_router
 from agent.api.qdrant_debug import router as qdrant_debug_router
+from agent.api.health import router as health_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # TODO
-    # Initialize resources (e.g., Redis connection, telemetry clients)
-    # Example: await init_redis()
+    # Models, vector store and graph load lazily. With WARMUP_ON_STARTUP (default) they are
+    # loaded in the background right away; /ready reports 503 until that finishes.
+    warmup_task = None
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        warmup_task = asyncio.create_task(asyncio.to_thread(run_warmup))
+    else:
+        mark_ready()
     yield
-    # Clean up resources (e.g., close DB connections)
-    # Example: await close_redis()
+    if warmup_task and not warmup_task.done():
+        # Cancelling does not stop the worker thread; let a pending snapshot wait return
+        stop_warmup()
+        warmup_task.cancel()
+    # Persist the on-disk embedding cache index and stop background refreshes
+    flush_embedding_cache()
+    stop_wiki_cache()
+    await close_ado_clients()
 
 app = FastAPI(title="AI Reasoning Agent", lifespan=lifespan)
 
@@ -45,6 +61,9 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors()},
     )
 
+# Liveness/readiness probes at the root
+app.include_router(health_router)
+
 # Register endpoints under /chat
 app.include_router(memory_router, prefix="/chat")
 app.include_router(debug_router, prefix="/chat")
@@ -0,0 +1,54 @@
+import pytest
+
+from agent.vector.index_pipeline import IndexPipeline
+
+def _stub_pipeline(clean, upserted, **kwargs):
+    return IndexPipeline(
+        clean,
+        encode=lambda chunk_docs: [[0.0, 1.0] for _ in chunk_docs],
+        filter_unchanged=lambda docs, meta: (docs, meta),
+        upsert=lambda chunk_meta, vectors: upserted.extend(zip(chunk_meta, vectors)),
+        **kwargs,
+    )
+
+def _clean(item):
+    return f"{item['title']}\n{item['description']}", {"id": item["id"], "title": item["title"]}
+
+def test_pipeline_upserts_every_item_in_order():
+    items = [{"id": n, "title": f"Item {n}", "description": "word " * (400 if n % 3 == 0 else 5)} for n in range(25)]
+    upserted, batches = [], []
+    stats = _stub_pipeline(_clean, upserted, batch_docs=4, queue_size=1).run(
+        iter(items), lambda batch, docs, meta: batches.append([i["id"] for i in batch])
+    )
+
+    assert [i for batch in batches for i in batch] == list(range(25))
+    assert all(len(batch) <= 4 for batch in batches)
+    # Long descriptions are split into several chunks, all upserted with their parent's id
+    assert {meta["parent_id"] for meta, _ in upserted} == {str(n) for n in range(25)}
+    assert stats["clean"]["items"] == 25
+    assert stats["embed"]["items"] == stats["upsert"]["items"] == len(upserted) > 25
+
+def test_pipeline_reraises_stage_errors():
+    def failing_clean(item):
+        raise ValueError("bad item")
+
+    with pytest.raises(ValueError, match="bad item"):
+        _stub_pipeline(failing_clean, []).run(iter([{"id": 1}]))
+
+def test_indexer_clean_stage_runs_through_pipeline():
+    for module in ("qdrant_client", "requests", "httpx", "dotenv"):
+        pytest.importorskip(module)
+    from agent.scripts.index_ado_to_qdrant import clean_item
+
+    upserted = []
+    item = {
+        "id": 7, "title": "Export fails", "description": "<p>Clicking <b>Export</b> &amp; nothing</p>",
+        "type": "Bug", "status": "New", "source": "work_item",
+    }
+    _stub_pipeline(clean_item, upserted).run(iter([item]))
+
+    meta, _ = upserted[0]
+    assert meta["description"] == "Export fails Clicking Export & nothing"
+    assert {k: meta[k] for k in ("id", "type", "work_item_type", "status", "source")} == {
+        "id": 7, "type": "Bug", "work_item_type": "Bug", "status": "New", "source": "work_item",
+    }
@@ -0,0 +1,63 @@
+import hashlib
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agent.utils.intent_prototypes import PrototypeIntentClassifier
+
+def _bag_of_words(texts):
+    """Stand-in for the sentence model: hashed bag-of-words vectors."""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+    return vectors
+
+EXAMPLES = {
+    "greeting": ["hi", "hello", "hi there", "hello there", "hey there", "hi friend", "hello friend", "hey"],
+    "bug_log": ["log a bug", "file a bug", "report a bug", "log bug", "file bug", "report bug", "new bug", "raise a bug"],
+    "story_log": ["create a story", "new story", "add a story", "log a story", "create story", "add story", "write a story", "draft a story"],
+}
+
+def _classifier(**kwargs):
+    return PrototypeIntentClassifier(EXAMPLES, top_k=2, encode=_bag_of_words, **kwargs)
+
+def _vector(text):
+    return _bag_of_words([text])[0]
+
+def test_decide_accepts_clear_match_and_defers_otherwise():
+    classifier = _classifier(threshold=0.6, margin=0.1)
+    label, score = classifier.decide(_vector("file a bug"))
+    assert label == "bug_log" and score >= 0.6
+    # Below the threshold: nothing like the examples
+    assert classifier.decide(_vector("quarterly revenue forecast"))[0] is None
+    # Above the threshold but no clear winner: half bug, half story
+    assert classifier.decide(_vector("bug story"))[0] is None
+    assert classifier.stats()["decided"] == 1
+    assert classifier.stats()["deferred_to_llm"] == 2
+
+def test_calibration_picks_settings_that_meet_precision_on_held_out_examples():
+    classifier = _classifier(precision=0.95)
+    classifier.encode_examples()
+    stats = classifier.stats()
+    assert stats["calibration"]["held_out"] == 6
+    assert stats["calibration"]["precision"] >= 0.95
+    assert stats["calibration"]["coverage"] > 0
+    assert stats["threshold"] is not None and stats["margin"] is not None
+    assert classifier.decide(_vector("please report a bug"))[0] == "bug_log"
+
+def test_calibration_keeps_pinned_values():
+    classifier = _classifier(threshold=0.6)
+    classifier.encode_examples()
+    assert classifier.threshold == 0.6
+    assert 0 <= classifier.margin <= 0.3
+
+def test_calibration_defers_everything_when_labels_are_indistinguishable():
+    same = ["log it", "file it", "raise it", "add it"]
+    classifier = PrototypeIntentClassifier(
+        {"bug_log": list(same), "story_log": list(same)}, top_k=2, holdout_every=2, encode=_bag_of_words
+    )
+    assert classifier.decide(_vector("log it"))[0] is None
+    assert classifier.stats()["threshold"] is None
+    assert classifier.stats()["calibration"]["coverage"] == 0.0
@@ -0,0 +1,32 @@
+from agent.utils.keywords import KEYWORDS, KeywordMatcher, has_keywords, keywords_at_edges, match_keywords
+
+def test_phrases_match_whole_words_only():
+    assert "greeting" in match_keywords("hi there")
+    assert "greeting" not in match_keywords("this dashboard")
+    assert "greeting" not in match_keywords("his dashboard")
+    assert "bug_mention" not in match_keywords("debugging the payment flow")
+
+def test_listed_plurals_match():
+    assert {"product", "bug_mention"} <= match_keywords("two bugs on the login page")
+    assert "story_mention" in match_keywords("any stories about exports?")
+    # Not every keyword takes a plural: "his" is not "hi", "logs" is not "log"
+    assert not has_keywords("show me the logs", "log_bug", "confirm_bug")
+
+def test_longer_phrase_keeps_categories_of_phrases_it_contains():
+    matcher = KeywordMatcher({"short": ["log"], "long": ["log it"], "other": ["bug"]})
+    assert matcher.match("please log it now") == {"short", "long"}
+    assert matcher.match("Log IT!") == {"short", "long"}
+    assert matcher.match("logit") == frozenset()
+
+def test_has_keywords_and_edges():
+    assert has_keywords("Yes, show me", "yes")
+    assert has_keywords("please file a bug for this", "confirm_bug", "confirm_story")
+    assert not has_keywords("what is the status", "greeting", "yes")
+    assert keywords_at_edges("ok thanks", "greeting")
+    assert keywords_at_edges("hello is the dashboard down?", "greeting")
+    assert not keywords_at_edges("what does hi mean here", "greeting")
+
+def test_every_category_matches_its_own_phrases():
+    for category, phrases in KEYWORDS.items():
+        for phrase in phrases:
+            assert category in match_keywords(phrase), (category, phrase)